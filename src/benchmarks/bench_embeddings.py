@@ -0,0 +1,46 @@
+"""
+Embedding throughput (docs/sec) of the local and remote backends.
+
+Run from the src directory:
+    python -m benchmarks.bench_embeddings --docs 512 --backends local google
+The google backend needs GOOGLE_API_KEY and counts against its quota.
+"""
+import argparse
+import random
+import time
+from benchmarks.synthetic_pdf import random_words
+from services.embedding_backends import create_backend
+
+
+def synthetic_chunks(count, words_per_chunk, seed=0):
+    rng = random.Random(seed)
+    return [random_words(rng, words_per_chunk) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=512)
+    parser.add_argument("--words", type=int, default=150, help="words per chunk, about CHUNK_SIZE characters")
+    parser.add_argument("--batch", type=int, default=100, help="texts per embed_documents call")
+    parser.add_argument("--backends", nargs="+", default=["local", "google"])
+    args = parser.parse_args()
+
+    chunks = synthetic_chunks(args.docs, args.words)
+    print(f"{'backend':<8} {'model':<42} {'dim':>5} {'seconds':>8} {'docs/s':>9}")
+    for name in args.backends:
+        try:
+            backend = create_backend(name)
+            # Load models and open connections before timing.
+            dimension = len(backend.embed_documents(chunks[:1])[0])
+            start = time.perf_counter()
+            for i in range(0, len(chunks), args.batch):
+                backend.embed_documents(chunks[i:i + args.batch])
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            print(f"{name:<8} failed: {e}")
+            continue
+        print(f"{name:<8} {backend.model_name:<42} {dimension:>5} {elapsed:>8.2f} {len(chunks) / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
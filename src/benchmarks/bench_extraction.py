@@ -0,0 +1,54 @@
+"""
+Throughput benchmark for the PDF extraction engine.
+
+Run from the src directory:
+    python -m benchmarks.bench_extraction --docs 3 --pages 300
+"""
+import argparse
+import os
+import time
+from benchmarks.synthetic_pdf import make_pdf
+from services.extraction_engine import extract_pages, shutdown_pool
+
+
+def run(documents, workers, pages_per_task, backend):
+    start = time.perf_counter()
+    pages = 0
+    chars = 0
+    for record in extract_pages(
+        documents,
+        max_pages=10 ** 9,
+        max_chars=10 ** 15,
+        workers=workers,
+        pages_per_task=pages_per_task,
+        parallel_min_pages=0,
+        backend=backend,
+    ):
+        pages += 1
+        chars += len(record.text)
+    elapsed = time.perf_counter() - start
+    return pages, chars, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--backend", default="pypdf2")
+    args = parser.parse_args()
+
+    documents = [(f"doc{i}.pdf", make_pdf(pages=args.pages, seed=i)) for i in range(args.docs)]
+    print(f"{args.docs} documents x {args.pages} pages, {args.backend} backend")
+    print(f"{'workers':>8} {'pages':>7} {'chars':>10} {'seconds':>8} {'pages/s':>9}")
+    for workers in sorted(set(args.workers)):
+        # Warm the pool first so process start-up is not billed to the run.
+        run(documents[:1], workers, args.pages_per_task, args.backend)
+        pages, chars, elapsed = run(documents, workers, args.pages_per_task, args.backend)
+        print(f"{workers:>8} {pages:>7} {chars:>10} {elapsed:>8.2f} {pages / elapsed:>9.1f}")
+    shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Compare the PDF text extraction backends on speed and agreement.
+
+For every installed backend, reports pages/sec and how closely its text
+matches the reference backend's, character by character after collapsing
+whitespace. Runs on generated PDFs, or on a directory of your own.
+
+Run from the src directory:
+    python -m benchmarks.bench_pdf_backends --docs 3 --pages 200
+    python -m benchmarks.bench_pdf_backends --corpus ~/papers
+"""
+import argparse
+import difflib
+import os
+import re
+import time
+from benchmarks.synthetic_pdf import make_pdf
+from services.pdf_backends import available_backends, get_backend
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def extract(backend, documents):
+    """Return the page texts of every document and the seconds it took."""
+    start = time.perf_counter()
+    texts = []
+    for data in documents:
+        reader = backend.open(data)
+        try:
+            texts.append([backend.page_text(reader, i) for i in range(backend.page_count(reader))])
+        finally:
+            backend.close(reader)
+    return texts, time.perf_counter() - start
+
+
+def agreement(texts, reference):
+    """Character-level similarity to the reference text, weighted by page length."""
+    matched = 0
+    total = 0
+    for pages, reference_pages in zip(texts, reference):
+        for text, expected in zip(pages, reference_pages):
+            a = _WHITESPACE.sub(" ", text).strip()
+            b = _WHITESPACE.sub(" ", expected).strip()
+            matched += sum(block.size for block in difflib.SequenceMatcher(None, a, b, autojunk=False).get_matching_blocks())
+            total += max(len(a), len(b))
+    return matched / total if total else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--corpus", help="Directory of PDFs to use instead of generated ones")
+    parser.add_argument("--reference", default="pypdf2")
+    parser.add_argument("--backends", nargs="+", default=None)
+    args = parser.parse_args()
+
+    if args.corpus:
+        paths = sorted(os.path.join(args.corpus, name) for name in os.listdir(args.corpus) if name.lower().endswith(".pdf"))
+        documents = []
+        for path in paths:
+            with open(path, "rb") as f:
+                documents.append(f.read())
+        print(f"{len(documents)} documents from {args.corpus}")
+    else:
+        documents = [make_pdf(pages=args.pages, seed=i) for i in range(args.docs)]
+        print(f"{args.docs} generated documents x {args.pages} pages")
+
+    installed = available_backends()
+    backends = args.backends or installed
+    missing = [name for name in backends if name not in installed]
+    if missing:
+        print(f"Not installed, skipped: {', '.join(missing)}")
+    backends = [name for name in backends if name in installed]
+    if args.reference not in installed:
+        parser.error(f"Reference backend {args.reference} is not installed")
+
+    reference, _ = extract(get_backend(args.reference), documents)
+    print(f"{'backend':>8} {'pages':>7} {'chars':>10} {'seconds':>8} {'pages/s':>9} {'agreement':>10}")
+    for name in backends:
+        texts, elapsed = extract(get_backend(name), documents)
+        pages = sum(len(doc) for doc in texts)
+        chars = sum(len(text) for doc in texts for text in doc)
+        print(f"{name:>8} {pages:>7} {chars:>10} {elapsed:>8.2f} {pages / elapsed:>9.1f} {agreement(texts, reference):>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Memory, latency and recall@k of the int8 quantized index against the exact index.
+
+Run from the src directory:
+    python -m benchmarks.bench_vector_index --vectors 50000 --dimension 768
+"""
+import argparse
+import mmap
+import os
+import tempfile
+import time
+import numpy as np
+from services.vector_index import VectorIndex
+
+
+def synthetic_vectors(count, dimension, clusters, seed):
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def directory_bytes(path, names):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in names)
+
+
+def resident_bytes(path, dimension, names, refined_rows=0):
+    """Memory a query keeps paged in: the files it scans plus the pages of the float32 rows it rescores."""
+    page = mmap.PAGESIZE
+    row_pages = (dimension * 4 + page - 1) // page + 1
+    return directory_bytes(path, names) + refined_rows * row_pages * page
+
+
+def measure(index, queries, k, **search_args):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        hits = index.similarity_search_with_score_by_vector(query, k=k, **search_args)
+        results.append({doc.metadata["chunk_id"] for doc, _ in hits})
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.vectors, args.dimension, args.clusters, seed=0)
+    queries = synthetic_vectors(args.queries, args.dimension, args.clusters, seed=1)
+    texts = [f"chunk {i}" for i in range(args.vectors)]
+    hashes = [f"{i:064x}" for i in range(args.vectors)]
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "index")
+        start = time.perf_counter()
+        VectorIndex.append(path, vectors, texts, hashes, quantize=True, quantize_min_vectors=0)
+        print(f"Built {args.vectors} x {args.dimension} index with int8 codes in {time.perf_counter() - start:.1f}s")
+        index = VectorIndex.open(path)
+
+        exact, exact_ms = measure(index, queries, args.k, exact=True)
+        rows = [("exact float32", resident_bytes(path, args.dimension, ["vectors.f32", "sq_norms.f32"]), exact_ms, exact)]
+        quantized_files = ["codes.i8", "sq_low.f32", "sq_step.f32", "sq_norms.f32"]
+        for refine in (0, 2, 4, 8):
+            label = f"int8 refine={refine}"
+            found, ms = measure(index, queries, args.k, refine=refine)
+            memory = resident_bytes(path, args.dimension, quantized_files, args.k * refine)
+            rows.append((label, memory, ms, found))
+
+        print(f"{'mode':<16} {'memory MB':>10} {'ms/query':>9} {f'recall@{args.k}':>10}")
+        for label, size, ms, found in rows:
+            recall = np.mean([len(f & e) / len(e) for f, e in zip(found, exact)])
+            print(f"{label:<16} {size / 1e6:>10.1f} {ms:>9.2f} {recall:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import random
+
+_WORDS = (
+    "matrix vector eigenvalue gradient entropy theorem lemma proof integral "
+    "derivative probability variance lecture syllabus chapter exercise model "
+    "algorithm complexity graph network protocol enzyme protein reaction cell "
+    "market demand supply elasticity equilibrium revenue policy history"
+).split()
+
+
+def random_words(rng, count):
+    """Return count words of course-like vocabulary drawn with a random.Random instance."""
+    return " ".join(rng.choice(_WORDS) for _ in range(count))
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages=300, lines_per_page=40, seed=0):
+    """
+    Build an uncompressed text-only PDF in memory.
+
+    Args:
+        pages (int): Number of pages to generate
+        lines_per_page (int): Number of text lines on each page
+        seed (int): Seed for the pseudo-random page text
+
+    Returns:
+        bytes: The PDF file contents
+    """
+    rng = random.Random(seed)
+    # Object 1 is the catalog, 2 the page tree, 3 the font; each page then
+    # takes two objects (page dictionary and content stream).
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page_no in range(pages):
+        lines = [f"BT /F1 10 Tf 40 800 Td 12 TL (Page {page_no + 1}) Tj"]
+        for _ in range(lines_per_page):
+            lines.append(f"T* ({_escape(random_words(rng, 12))}) Tj")
+        lines.append("ET")
+        stream = "\n".join(lines).encode("latin-1")
+        page_id = len(objects) + 1
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode("latin-1")
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(page_id)
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -25,3 +25,130 @@ CHUNK_OVERLAP = 100
 TRANSLATION_CHUNK_SIZE = 4000
 SPEECH_CHUNK_SIZE = 5000
 MAX_RETRIES = 3
+
+# PDF extraction
+# Text extractor: "pypdf2", "pdfium" (pypdfium2) or "pymupdf" (PyMuPDF)
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf2")
+EXTRACTION_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+EXTRACTION_PAGES_PER_TASK = 16
+EXTRACTION_PARALLEL_MIN_PAGES = 64
+EXTRACTION_CACHE_PATH = "extraction_cache.db"
+EXTRACTION_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Pages buffered before they are written to the extraction cache
+EXTRACTION_CACHE_WRITE_PAGES = 32
+
+# Background ingestion
+INGESTION_WORKERS = 2
+INGESTION_JOBS_PATH = "ingestion_jobs.db"
+# Minimum seconds between progress writes of a running job
+INGESTION_PROGRESS_INTERVAL = 0.5
+
+# Embeddings
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google")  # "google", "local" or "hash"
+EMBEDDING_MODEL = "models/embedding-001"
+LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+LOCAL_EMBEDDING_BATCH_SIZE = 64
+LOCAL_EMBEDDING_THREADS = 2
+EMBEDDING_CACHE_PATH = "embedding_cache.db"
+EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_CONCURRENCY = 4
+EMBEDDING_REQUESTS_PER_MINUTE = 1500
+# Chunks embedded and written to the index per step while a document streams in
+INGEST_BATCH_CHUNKS = EMBEDDING_BATCH_SIZE * EMBEDDING_CONCURRENCY
+
+# Vector index
+FAISS_INDEX_PATH = "faiss_index"
+VECTOR_STORE_ROOT = "vector_store"
+INDEX_MEMORY_BUDGET_BYTES = 1024 * 1024 * 1024
+QUANTIZE_ENABLED = True
+# Indexes are per document, so this is about a 300-page book
+QUANTIZE_MIN_VECTORS = 1024
+QUANTIZE_RETRAIN_GROWTH = 2.0
+QUANTIZE_REFINE_FACTOR = 4
+
+# Hybrid retrieval
+HYBRID_ENABLED = True
+HYBRID_CANDIDATES = 10
+HYBRID_RRF_K = 60
+HYBRID_KEYWORD_MAX_TERMS = 3
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Reranking
+RERANK_ENABLED = False
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 12
+RERANK_TOP_K = 3
+RERANK_BUDGET_SECONDS = 1.5
+RERANK_BATCH_SIZE = 32
+
+# LLM gateway
+# Gemini model used by every service
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.0-flash")
+# "gemini", or "fake" for canned local replies in tests and offline runs
+LLM_TRANSPORT = os.getenv("LLM_TRANSPORT", "gemini")
+LLM_MAX_CONCURRENCY = 8
+LLM_REQUESTS_PER_MINUTE = 60
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BACKOFF_SECONDS = 1.0
+# Deadline for a whole call, retries included
+LLM_TIMEOUT_SECONDS = 60
+
+# LLM response cache
+LLM_CACHE_PATH = "llm_cache.db"
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 3600
+LLM_CACHE_MAX_BYTES = 128 * 1024 * 1024
+# Services whose Gemini calls go through the cache
+LLM_CACHE_SERVICES = ("chat", "summary", "flashcards", "quiz")
+
+# Semantic question cache
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_PATH = "semantic_cache.db"
+# Minimum cosine similarity for a stored answer to be reused
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+
+# Summarization
+# Longer texts are summarized map-reduce style instead of in one prompt
+SUMMARY_SINGLE_PASS_CHARS = 30000
+SUMMARY_CHUNK_CHARS = 12000
+# Partial summaries combined per reduce call
+SUMMARY_REDUCE_FANOUT = 6
+SUMMARY_WORKERS = 4
+SUMMARY_CACHE_PATH = "summary_cache.db"
+# Least recently used tree nodes are evicted past this size
+SUMMARY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Context sampling for quizzes and flashcards
+# Prompt budget for document excerpts, independent of document size
+CONTEXT_SAMPLE_TOKENS = 6000
+CHARS_PER_TOKEN = 4
+# Chunks considered per sample; larger documents are subsampled first
+CONTEXT_SAMPLE_POOL = 2000
+# MMR trade-off between relevance (1.0) and diversity (0.0)
+CONTEXT_MMR_LAMBDA = 0.5
+
+# Quiz question bank
+QUESTION_BANK_PATH = "question_bank.db"
+QUIZ_QUESTION_COUNT = 5
+# Generation calls per fill, run concurrently; each asks for QUIZ_QUESTION_COUNT questions
+QUESTION_BANK_FILL_ROUNDS = 3
+# Per document: processing fills documents with fewer questions than this,
+# and a draw refills a document in the background once a user has fewer left unseen
+QUESTION_BANK_LOW_WATER = 10
+
+# Flashcard decks
+FLASHCARD_DECK_PATH = "flashcard_decks.db"
+FLASHCARD_PAGE_SIZE = 5
+# Cards generated per model call; Regenerate pages through them before asking for more
+FLASHCARD_BATCH_SIZE = 20
+
+# Conversation memory
+# Recent chat turns kept verbatim in the answer prompt
+CHAT_HISTORY_TOKENS = 1500
+# Target length of the running summary older turns are folded into
+CHAT_SUMMARY_TOKENS = 300
+
+# Document artifacts (summary, flashcards, quiz) generated after processing
+ARTIFACTS_PATH = "artifacts.db"
+ARTIFACT_WAIT_SECONDS = 120
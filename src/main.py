@@ -9,7 +9,10 @@ from ui.components import (
     translation_interface,
     sharing_interface,
     analysis_interface,
-    audio_interface
+    audio_interface,
+    conversation_memory,
+    documents_ready,
+    document_text
 )
 from ui.profile_components import profile_page, save_current_chat
 from utils.cleanup import cleanup_old_data
@@ -18,7 +21,7 @@ import google.generativeai as genai
 from config.settings import GOOGLE_API_KEY
 
 # Import the required functions from the document_processor service
-from services.document_processor import get_pdf_text, get_text_chunks, update_vector_store
+from services.document_processor import iter_pdf_pages
 from services.ai_service import ai_service
 from services.quiz_service import quiz_service
 from services.flashcard_service import flashcard_service
@@ -26,7 +29,8 @@ from services.translation_service import translation_service
 from services.sharing_service import sharing_service
 from services.text_complexity_service import analyze_text_complexity, visualize_text_complexity
 from services.key_concepts_service import extract_key_concepts
-from services.text_summary_service import summarize_document
+from services.text_summary_service import summarize_pages
+from services.artifact_store import artifact_store
 from services.text_translation_service import TranslationService
 from services.speech_service import speech_service
 from services.profile_service import profile_service
@@ -168,38 +172,48 @@ def main():
                     with st.chat_message("user"):
                         st.markdown(prompt)
                 
-                if st.session_state.context and st.session_state.pdf_docs:
-                    with st.spinner("Generating response..."):
-                        response = ai_service.user_input(prompt)
-                        st.session_state.messages.append({"role": "assistant", "content": response['output_text']})
-                        
-                        if 'username' in st.session_state and st.session_state.username:
-                            if 'current_chat_id' not in st.session_state:
-                                import time
-                                st.session_state.current_chat_id = f"chat_{int(time.time())}"
-                                st.session_state.chat_cleared = False
-                            
-                            # Only auto-save if chat hasn't been manually saved and hasn't been cleared
-                            if not st.session_state.get('chat_cleared', False) and not st.session_state.get('chat_manually_saved', False):
-                                from ui.profile_components import profile_service
-                                chat_content = json.dumps(st.session_state.messages)
-                                
-                                default_name = "Chat Session"
-                                if 'pdf_docs' in st.session_state and st.session_state.pdf_docs:
-                                    pdf_names = [pdf.name for pdf in st.session_state.pdf_docs]
-                                    default_name = f"Chat about {', '.join(pdf_names[:2])}"
-                                    if len(pdf_names) > 2:
-                                        default_name += f" and {len(pdf_names) - 2} more"
-                                
-                                import datetime
-                                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-                                project_name = f"{default_name} ({timestamp})"
-                                
-                                profile_service.save_chat_history(st.session_state.username, project_name, chat_content)
-                    
+                if documents_ready():
                     with chat_container:
                         with st.chat_message("assistant"):
-                            st.markdown(response['output_text'])
+                            with st.spinner("Generating response..."):
+                                stream = ai_service.user_input_stream(
+                                    prompt,
+                                    st.session_state.get("username"),
+                                    st.session_state.get("doc_ids"),
+                                    memory=conversation_memory(st.session_state.messages[:-1])
+                                )
+                            # Render tokens as they arrive; the full text is kept for history.
+                            st.write_stream(stream)
+                            answer = stream.output_text
+                            if stream.sources:
+                                sources = f"*Sources: {stream.sources}*"
+                                st.markdown(sources)
+                                answer += f"\n\n{sources}"
+                    st.session_state.messages.append({"role": "assistant", "content": answer})
+                    
+                    if 'username' in st.session_state and st.session_state.username:
+                        if 'current_chat_id' not in st.session_state:
+                            import time
+                            st.session_state.current_chat_id = f"chat_{int(time.time())}"
+                            st.session_state.chat_cleared = False
+                        
+                        # Only auto-save if chat hasn't been manually saved and hasn't been cleared
+                        if not st.session_state.get('chat_cleared', False) and not st.session_state.get('chat_manually_saved', False):
+                            from ui.profile_components import profile_service
+                            chat_content = json.dumps(st.session_state.messages)
+                            
+                            default_name = "Chat Session"
+                            if 'pdf_docs' in st.session_state and st.session_state.pdf_docs:
+                                pdf_names = [pdf.name for pdf in st.session_state.pdf_docs]
+                                default_name = f"Chat about {', '.join(pdf_names[:2])}"
+                                if len(pdf_names) > 2:
+                                    default_name += f" and {len(pdf_names) - 2} more"
+                            
+                            import datetime
+                            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+                            project_name = f"{default_name} ({timestamp})"
+                            
+                            profile_service.save_chat_history(st.session_state.username, project_name, chat_content)
                 else:
                     st.error("Please upload and process documents first.")
         
@@ -214,10 +228,15 @@ def main():
                 unsafe_allow_html=True
             )
             
-            context = st.session_state.get("context", "")
-            if context:
+            if documents_ready():
                 with st.spinner("Generating summary..."):
-                    summary = summarize_document(context)
+                    summary = artifact_store.ready(
+                        st.session_state.get("username"), st.session_state.doc_ids, "summary"
+                    )
+                    if summary is None:
+                        summary = summarize_pages(
+                            record.text for record in iter_pdf_pages(st.session_state.pdf_docs)
+                        )
                 
                 st.markdown(
                     f"""
@@ -278,10 +297,9 @@ def main():
                 unsafe_allow_html=True
             )
             
-            context = st.session_state.get("context", "")
-            if context:
+            if documents_ready():
                 with st.spinner("Extracting key concepts..."):
-                    key_concepts = extract_key_concepts(context)
+                    key_concepts = extract_key_concepts(document_text())
                 
                 st.markdown("<h4>Key Concepts:</h4>", unsafe_allow_html=True)
                 
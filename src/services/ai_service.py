@@ -1,54 +1,342 @@
-import google.generativeai as genai
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
+from services.embedding_service import get_embeddings
+from services.index_manager import index_manager
+from services.namespaces import list_document_ids, namespace_path
+from services.reranker import reranker
+from services.llm_gateway import llm_gateway
+from services.semantic_cache import document_set_key, semantic_cache
+from services.sparse_index import tokenize
 from utils.logging_config import logger
-from config.settings import GOOGLE_API_KEY
+from config.settings import (
+    GOOGLE_API_KEY, HYBRID_ENABLED, HYBRID_CANDIDATES, HYBRID_RRF_K, HYBRID_KEYWORD_MAX_TERMS,
+    RERANK_ENABLED, RERANK_CANDIDATES, RERANK_TOP_K, SEMANTIC_CACHE_ENABLED
+)
+
+NO_RESPONSE = "No readable response generated."
+
+# Words that make a query a natural-language question rather than a keyword lookup.
+_QUESTION_WORDS = frozenset(
+    "how what when where which who whom whose why explain describe tell me about please give "
+    "show define compare summarize summarise list can could would should".split()
+)
+
+class AnswerStream:
+    """
+    Iterator over the pieces of an answer as they are generated.
+
+    Once it has been exhausted, output_text holds the complete answer; sources
+    are known up front.
+    """
+
+    def __init__(self, pieces, sources="", on_complete=None, on_failure=None):
+        self.sources = sources
+        self.output_text = None
+        self.failed = False
+        self._pieces = pieces
+        self._on_complete = on_complete
+        self._on_failure = on_failure
+
+    def __iter__(self):
+        received = []
+        try:
+            for piece in self._pieces:
+                received.append(piece)
+                yield piece
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            self.failed = True
+            message = f"Error generating response: {str(e)}"
+            received.append(message)
+            yield message
+        if not "".join(received).strip():
+            received = [NO_RESPONSE]
+            self.failed = True
+            yield NO_RESPONSE
+        self.output_text = "".join(received)
+        logger.info(f"Generated reply: {self.output_text}")
+        if self._on_complete and not self.failed:
+            self._on_complete(self)
+        elif self._on_failure and self.failed:
+            self._on_failure(self)
 
 class AIService:
-    def get_gemini_response(self, question, context):
-        """Generate a response to a question based on the provided context."""
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        prompt = f"""
+    def _answer_prompt(self, question, context, history=""):
+        conversation = ""
+        if history:
+            conversation = f"""
+        Conversation so far (use it to understand follow-up questions; answer from the context):
+        {history}
+        """
+        return f"""
         Answer the question as detailed as possible from the provided context. Make sure to provide all the details.
         If the answer is not in the provided context, just say, "Answer is not available in the context." Don't provide a wrong answer.
-        
+        {conversation}
         Context: {context}
 
         Question: {question}
 
         Answer:
         """
+
+    def get_gemini_response(self, question, context, history=""):
+        """Generate a response to a question based on the provided context and conversation history."""
+        prompt = self._answer_prompt(question, context, history)
         try:
-            response = model.generate_content(prompt)
+            reply = llm_gateway.generate(prompt, service="chat")
+            if reply is not None and reply.strip():
+                logger.info(f"Generated reply: {reply}")  # Log the generated reply
+                return reply
             
-            # Log the raw response from the model
-            logger.info(f"Model response: {response}")
-            
-            if response.candidates:
-                candidate = response.candidates[0]
-                if candidate.content and candidate.content.parts:
-                    reply = ' '.join(part.text for part in candidate.content.parts)
-                    logger.info(f"Generated reply: {reply}")  # Log the generated reply
-                    return reply
-            
-            return "No readable response generated."
+            return NO_RESPONSE
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
             return f"Error generating response: {str(e)}"
 
-    def user_input(self, user_question):
-        """Handle user input and generate a response based on the question."""
+    def stream_gemini_response(self, question, context, history=""):
+        """Yield the response to a question piece by piece as Gemini generates it."""
+        return llm_gateway.stream(self._answer_prompt(question, context, history), service="chat")
+
+    def _open_indexes(self, username, doc_ids):
+        if doc_ids is None:
+            doc_ids = list_document_ids(username)
+        stores = []
+        for doc_id in doc_ids:
+            try:
+                stores.append(index_manager.get(namespace_path(username, doc_id)))
+            except FileNotFoundError:
+                logger.warning(f"No index found for document {doc_id}")
+        return stores
+
+    def _is_keyword_query(self, tokens, stores):
+        """
+        Whether a query is answered from BM25 alone.
+
+        That is a short query whose every term is indexed, and which either
+        has no question words or names a code or formula (a term with digits
+        or hyphens, such as CS-101 or H2O), e.g. "explain CS-101".
+        """
+        terms = set(tokens) - _QUESTION_WORDS
+        if not terms or len(terms) > HYBRID_KEYWORD_MAX_TERMS:
+            return False
+        if terms != set(tokens) and not any(
+            "-" in term or any(ch.isdigit() for ch in term) for term in terms
+        ):
+            return False
+        return all(
+            any(store.sparse is not None and store.sparse.contains(token) for store in stores)
+            for token in terms
+        )
+
+    def search(self, question, username=None, doc_ids=None, k=2, pages=None, stores=None, embedding=None):
+        """
+        Search a user's document indexes, fusing BM25 and vector rankings.
+
+        Args:
+            question (str): The question to retrieve context for
+            username (str, optional): The user whose documents are searched
+            doc_ids (list, optional): Restrict the search to these documents;
+                defaults to every document indexed for the user
+            k (int): Number of chunks to return
+            pages (tuple, optional): Only return chunks overlapping this
+                (first, last) zero-based page range
+            stores (list, optional): Indexes already opened for username and doc_ids
+            embedding (list, optional): Embedding of the question, if already computed
+
+        Returns:
+            list: The k best documents across all searched indexes
+        """
+        if stores is None:
+            stores = self._open_indexes(username, doc_ids)
+        if not stores:
+            return []
+        candidates = max(k, HYBRID_CANDIDATES)
+
+        sparse = []
+        tokens = tokenize(question)
+        if HYBRID_ENABLED:
+            per_document = []
+            for store in stores:
+                if store.sparse is not None:
+                    hits = store.sparse.search(tokens, candidates, store.page_mask(pages))
+                    if hits:
+                        per_document.append([(score, store, row) for row, score in hits])
+            sparse = self._merge_sparse(per_document, candidates)
+            if sparse and self._is_keyword_query(tokens, stores):
+                logger.info("Keyword query answered from the sparse index.")
+                return [store.document(row) for _, store, row in sparse[:k]]
+
+        # Embed once and reuse the vector for every sub-index.
+        embeddings = get_embeddings()
+        if embedding is None:
+            embedding = embeddings.embed_query(question)
+        dense = []
+        for store in stores:
+            if store.meta.get("model") != embeddings.model_name:
+                # Indexed with another backend; it is re-embedded on its next update.
+                continue
+            dense.extend(
+                (score, store, doc.metadata["chunk_id"])
+                for doc, score in store.similarity_search_with_score_by_vector(
+                    embedding, k=candidates, mask=store.page_mask(pages)
+                )
+            )
+        # Scores are squared L2 distances, lower is closer.
+        dense.sort(key=lambda hit: hit[0])
+
+        best = self._fuse([dense, sparse], candidates)[:k]
+        return [store.document(row) for _, store, row in best]
+
+    def _merge_sparse(self, rankings, depth):
+        """
+        Merge per-document BM25 rankings into one, taking each document's hits in turn.
+
+        BM25 scores depend on each index's own statistics, so documents are
+        interleaved by rank; within a rank the higher score goes first. The
+        merged list then counts as a single ranking in the fusion, however
+        many documents are searched.
+        """
+        merged = []
+        for rank in range(max((len(ranking) for ranking in rankings), default=0)):
+            tier = [ranking[rank] for ranking in rankings if rank < len(ranking)]
+            merged.extend(sorted(tier, key=lambda hit: -hit[0]))
+            if len(merged) >= depth:
+                break
+        return merged[:depth]
+
+    def _fuse(self, rankings, depth):
+        """Reciprocal rank fusion of (score, store, row) rankings; returns (fused score, store, row), best first."""
+        fused = {}
+        for ranking in rankings:
+            for rank, (_, store, row) in enumerate(ranking[:depth]):
+                key = (store.path, row)
+                score, _, _ = fused.get(key, (0.0, store, row))
+                fused[key] = (score + 1.0 / (HYBRID_RRF_K + rank + 1), store, row)
+        return sorted(fused.values(), key=lambda hit: -hit[0])
+
+    def cite_sources(self, docs):
+        """Format the documents and pages the retrieved chunks came from, e.g. "notes.pdf p. 3, 5-6"."""
+        pages = {}
+        for doc in docs:
+            name = doc.metadata.get("name") or doc.metadata.get("doc_id")
+            start, end = doc.metadata.get("page_start", -1), doc.metadata.get("page_end", -1)
+            if name and start >= 0:
+                label = f"{start + 1}" if start == end else f"{start + 1}-{end + 1}"
+                if label not in pages.setdefault(name, []):
+                    pages[name].append(label)
+        return "; ".join(f"{name} p. {', '.join(labels)}" for name, labels in pages.items())
+
+    def _retrieve(self, user_question, stores, embedding=None):
+        if RERANK_ENABLED:
+            # Over-fetch, then keep only the passages the cross-encoder rates best.
+            docs = self.search(user_question, k=RERANK_CANDIDATES, stores=stores, embedding=embedding)
+            return reranker.rerank(user_question, docs, RERANK_TOP_K)
+        return self.search(user_question, k=2, stores=stores, embedding=embedding)
+
+    def _cached_answer(self, user_question, stores, memory=None):
+        """Return (cached answer or None, semantic cache key, question embedding)."""
+        # Follow-up answers depend on the conversation, not just the question.
+        if not SEMANTIC_CACHE_ENABLED or memory or not stores:
+            return None, None, None
+        # Keyword queries are answered from BM25 alone; embedding them for a lookup would cost more than it saves.
+        if HYBRID_ENABLED and self._is_keyword_query(tokenize(user_question), stores):
+            return None, None, None
+        question_vector = get_embeddings().embed_query(user_question)
+        cache_key = document_set_key(stores)
+        return semantic_cache.lookup(*cache_key, question_vector), cache_key, question_vector
+
+    def _retrieval_query(self, user_question, stores, memory):
+        """The question, with conversation context added unless it is a keyword query that BM25 answers as is."""
+        if memory is None or (HYBRID_ENABLED and self._is_keyword_query(tokenize(user_question), stores)):
+            return user_question
+        return memory.retrieval_query(user_question)
+
+    def user_input(self, user_question, username=None, doc_ids=None, memory=None):
+        """
+        Handle user input and generate a response based on the question.
+
+        Pass the session's ConversationMemory as memory to answer follow-up
+        questions in the context of the conversation; the exchange is then
+        recorded in it.
+        """
         try:
-            embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-            new_db = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
-            docs = new_db.similarity_search(user_question, k=2)
+            stores = self._open_indexes(username, doc_ids)
+            cached, cache_key, question_vector = self._cached_answer(user_question, stores, memory)
+            if cached is not None:
+                if memory is not None:
+                    memory.add_turn(user_question, cached["output_text"])
+                return cached
+
+            query = self._retrieval_query(user_question, stores, memory)
+            # The question's embedding is reused when it is also the retrieval query.
+            docs = self._retrieve(query, stores, question_vector if query == user_question else None)
             context = "\n".join([doc.page_content for doc in docs])
             logger.info(f"Retrieved context: {context}...")
-            response = self.get_gemini_response(user_question, context)
-            return {"output_text": response}
+            history = memory.prompt_history() if memory is not None else ""
+            response = self.get_gemini_response(user_question, context, history)
+            result = {"output_text": response, "sources": self.cite_sources(docs)}
+            if response != NO_RESPONSE and not response.startswith("Error generating response"):
+                if cache_key and docs:
+                    semantic_cache.add(*cache_key, user_question, question_vector, result)
+                if memory is not None:
+                    memory.add_turn(user_question, response)
+            elif memory is not None:
+                memory.skip_turn()
+            return result
         except Exception as e:
             logger.error(f"Error in user_input: {str(e)}")
+            if memory is not None:
+                memory.skip_turn()
             return {"output_text": f"An error occurred: {str(e)}"}
 
+    def user_input_stream(self, user_question, username=None, doc_ids=None, memory=None):
+        """
+        Answer a question like user_input, streaming the answer as it is generated.
+
+        A given memory receives the exchange once the answer has streamed
+        completely; a failed answer is only counted.
+
+        Returns:
+            AnswerStream: Iterate it (e.g. with st.write_stream) to receive the
+            answer; afterwards output_text holds the full text for saving
+        """
+        try:
+            stores = self._open_indexes(username, doc_ids)
+            cached, cache_key, question_vector = self._cached_answer(user_question, stores, memory)
+            if cached is not None:
+                if memory is not None:
+                    memory.add_turn(user_question, cached["output_text"])
+                return AnswerStream(iter([cached["output_text"]]), cached.get("sources", ""))
+
+            query = self._retrieval_query(user_question, stores, memory)
+            # The question's embedding is reused when it is also the retrieval query.
+            docs = self._retrieve(query, stores, question_vector if query == user_question else None)
+            context = "\n".join([doc.page_content for doc in docs])
+            logger.info(f"Retrieved context: {context}...")
+            history = memory.prompt_history() if memory is not None else ""
+        except Exception as e:
+            logger.error(f"Error in user_input_stream: {str(e)}")
+            if memory is not None:
+                memory.skip_turn()
+            return AnswerStream(iter([f"An error occurred: {str(e)}"]))
+
+        def forget(stream):
+            # Still counted, so the memory keeps matching the chat's messages.
+            if memory is not None:
+                memory.skip_turn()
+
+        def remember(stream):
+            if cache_key and docs:
+                result = {"output_text": stream.output_text, "sources": stream.sources}
+                semantic_cache.add(*cache_key, user_question, question_vector, result)
+            if memory is not None:
+                memory.add_turn(user_question, stream.output_text)
+
+        return AnswerStream(
+            self.stream_gemini_response(user_question, context, history), self.cite_sources(docs),
+            on_complete=remember, on_failure=forget
+        )
+
 # Create a singleton instance
-ai_service = AIService()
\ No newline at end of file
+ai_service = AIService()
+
+if RERANK_ENABLED:
+    reranker.warm()
\ No newline at end of file
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from services.flashcard_deck import flashcard_deck
+from services.namespaces import document_set_id
+from services.question_bank import question_bank
+from services.document_processor import get_pdf_text, iter_pdf_pages
+from services.text_summary_service import summarize_pages_async
+from utils.logging_config import logger
+from config.settings import ARTIFACTS_PATH, ARTIFACT_WAIT_SECONDS
+
+# Artifact states
+PENDING, READY, FAILED = "pending", "ready", "failed"
+
+ARTIFACT_KINDS = ("summary", "flashcards", "quiz")
+
+class ArtifactStore:
+    """Generated study material per user and document set, filled in the background after processing."""
+
+    def __init__(self, db_path=ARTIFACTS_PATH):
+        """Initialize the ArtifactStore class."""
+        self.db_path = db_path
+        self.create_artifacts_table()
+
+    def create_artifacts_table(self):
+        """Create the artifact table and forget generations a restart interrupted."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS artifacts(
+                username TEXT,
+                doc_set TEXT,
+                kind TEXT,
+                status TEXT,
+                payload TEXT,
+                error TEXT,
+                updated_at REAL,
+                PRIMARY KEY (username, doc_set, kind)
+            )
+            ''')
+            c.execute('DELETE FROM artifacts WHERE status = ?', (PENDING,))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating artifacts table: {str(e)}")
+
+    def _write(self, username, doc_set, kind, status, payload=None, error=None):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            INSERT OR REPLACE INTO artifacts(username, doc_set, kind, status, payload, error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (username or "", doc_set, kind, status, json.dumps(payload), error, time.time()))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error writing artifact {kind}: {str(e)}")
+
+    def get(self, username, doc_ids, kind):
+        """
+        Return an artifact of a user's document set.
+
+        Args:
+            username (str): The user the artifact was generated for
+            doc_ids (list): The documents it was generated from
+            kind (str): "summary", "flashcards" or "quiz"
+
+        Returns:
+            dict: status, payload and error, or None if it was never generated
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            SELECT status, payload, error FROM artifacts WHERE username = ? AND doc_set = ? AND kind = ?
+            ''', (username or "", document_set_id(doc_ids), kind))
+            row = c.fetchone()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading artifact {kind}: {str(e)}")
+            return None
+        if row is None:
+            return None
+        return {"status": row[0], "payload": json.loads(row[1]) if row[1] else None, "error": row[2]}
+
+    def wait(self, username, doc_ids, kind, timeout=ARTIFACT_WAIT_SECONDS):
+        """Like get, but wait while the artifact is still being generated."""
+        deadline = time.monotonic() + timeout
+        artifact = self.get(username, doc_ids, kind)
+        while artifact and artifact["status"] == PENDING and time.monotonic() < deadline:
+            time.sleep(0.25)
+            artifact = self.get(username, doc_ids, kind)
+        return artifact
+
+    def ready(self, username, doc_ids, kind):
+        """Return the payload of a finished artifact, waiting for one in progress, or None."""
+        artifact = self.wait(username, doc_ids, kind)
+        if artifact and artifact["status"] == READY:
+            return artifact["payload"]
+        return None
+
+    async def _produce(self, username, doc_set, kind, generation):
+        started = time.monotonic()
+        try:
+            payload, error = await generation
+        except Exception as e:
+            payload, error = None, str(e)
+        if error:
+            logger.error(f"Generating {kind} failed: {error}")
+            self._write(username, doc_set, kind, FAILED, error=error)
+        else:
+            self._write(username, doc_set, kind, READY, payload)
+            logger.info(f"Generated {kind} in {time.monotonic() - started:.1f}s.")
+
+    async def generate(self, pdf_docs, username, doc_ids):
+        """
+        Generate the summary of a document set and fill its flashcard deck and
+        quiz question bank, concurrently.
+
+        Each artifact is stored as soon as its own call finishes, so the total
+        time is that of the slowest call rather than the sum. The summary reads
+        the pages back from the extraction cache as it goes; flashcards and
+        quiz questions are drawn from sampled chunks, and the full text is only
+        assembled if the documents turn out not to be indexed. start() marks
+        the artifacts pending before this runs.
+        """
+        doc_set = document_set_id(doc_ids)
+
+        def context():
+            return get_pdf_text(pdf_docs)
+
+        async def summary():
+            text = await summarize_pages_async(record.text for record in iter_pdf_pages(pdf_docs))
+            failed = text.startswith(("Error during summarization", "Unable to generate summary", "Input text is too short"))
+            return (None, text) if failed else (text, None)
+
+        async def flashcards():
+            added, error = await asyncio.to_thread(flashcard_deck.ensure, context, username, doc_ids)
+            return (None, error) if error else ({"added": added}, None)
+
+        async def quiz():
+            banked = await asyncio.to_thread(question_bank.ensure, context, username, doc_ids)
+            return ({"banked": banked}, None) if banked else (None, "No quiz questions were generated.")
+
+        await asyncio.gather(
+            self._produce(username, doc_set, "summary", summary()),
+            self._produce(username, doc_set, "flashcards", flashcards()),
+            self._produce(username, doc_set, "quiz", quiz()),
+        )
+
+    def _mark_pending(self, username, doc_ids):
+        doc_set = document_set_id(doc_ids)
+        for kind in ARTIFACT_KINDS:
+            self._write(username, doc_set, kind, PENDING)
+        return doc_set
+
+    def start(self, pdf_docs, username, doc_ids):
+        """Run generate() for a document set on a background thread."""
+        # Mark the artifacts before returning, so tabs opened right away wait
+        # for them instead of starting duplicate generations.
+        self._mark_pending(username, doc_ids)
+        thread = threading.Thread(
+            target=asyncio.run, args=(self.generate(pdf_docs, username, doc_ids),),
+            name="artifacts", daemon=True
+        )
+        thread.start()
+        return thread
+
+# Create singleton instance
+artifact_store = ArtifactStore()
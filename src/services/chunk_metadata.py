@@ -0,0 +1,52 @@
+import os
+import numpy as np
+
+# Column name and dtype of every per-chunk field. Pages are zero-based and
+# character offsets index into the document's extracted text; -1 means unknown.
+COLUMNS = (
+    ("page_start", np.int32),
+    ("page_end", np.int32),
+    ("char_start", np.int64),
+    ("char_end", np.int64),
+)
+
+class ChunkMetadata:
+    """Columnar per-chunk metadata: one NumPy array per field, aligned with chunk rows."""
+
+    def __init__(self, **columns):
+        for name, dtype in COLUMNS:
+            setattr(self, name, np.asarray(columns[name], dtype=dtype))
+
+    @classmethod
+    def unknown(cls, count):
+        """Metadata for count chunks whose origin isn't known."""
+        return cls(**{name: np.full(count, -1, dtype=dtype) for name, dtype in COLUMNS})
+
+    @classmethod
+    def concat(cls, parts):
+        return cls(**{name: np.concatenate([getattr(part, name) for part in parts]) for name, _ in COLUMNS})
+
+    def __len__(self):
+        return len(self.page_start)
+
+    def row(self, i):
+        """Return the metadata of chunk i as a dict."""
+        return {name: int(getattr(self, name)[i]) for name, _ in COLUMNS}
+
+    def page_mask(self, first_page, last_page):
+        """Boolean mask of the chunks overlapping pages first_page..last_page (inclusive)."""
+        return (self.page_end >= first_page) & (self.page_start <= last_page)
+
+    def save(self, directory):
+        for name, _ in COLUMNS:
+            np.save(os.path.join(directory, f"chunk_{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, count):
+        """Map the metadata columns stored in directory (indexes without them get unknown metadata)."""
+        if not os.path.exists(os.path.join(directory, "chunk_page_start.npy")):
+            return cls.unknown(count)
+        return cls(**{
+            name: np.load(os.path.join(directory, f"chunk_{name}.npy"), mmap_mode="r")
+            for name, _ in COLUMNS
+        })
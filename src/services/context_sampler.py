@@ -0,0 +1,143 @@
+import numpy as np
+from services.embedding_service import get_embeddings
+from services.index_manager import index_manager
+from services.namespaces import namespace_path
+from utils.logging_config import logger
+from config.settings import CONTEXT_SAMPLE_TOKENS, CHARS_PER_TOKEN, CONTEXT_SAMPLE_POOL, CONTEXT_MMR_LAMBDA
+
+def estimate_tokens(text):
+    """Rough token count of a text, good enough for prompt budgeting."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+class ContextSampler:
+    """
+    Pick a small, diverse set of indexed chunks to stand in for whole documents in a prompt.
+
+    Chunks are chosen by maximal marginal relevance over their stored
+    embeddings: relevance is similarity to the topic when one is given, else
+    to the centroid of the documents, and every pick penalizes chunks similar
+    to those already taken. Picks stop at the token budget, so prompts stay
+    the same size however large the documents grow.
+    """
+
+    def __init__(self, budget_tokens=CONTEXT_SAMPLE_TOKENS, pool_size=CONTEXT_SAMPLE_POOL,
+                 mmr_lambda=CONTEXT_MMR_LAMBDA):
+        """Initialize the ContextSampler class."""
+        self.budget_tokens = budget_tokens
+        self.pool_size = pool_size
+        self.mmr_lambda = mmr_lambda
+
+    def _stores(self, username, doc_ids, model_name):
+        stores = []
+        for doc_id in doc_ids:
+            try:
+                store = index_manager.get(namespace_path(username, doc_id))
+            except FileNotFoundError:
+                logger.warning(f"No index found for document {doc_id}")
+                continue
+            # Vectors from another embedding backend aren't comparable; it is re-embedded on its next update.
+            if len(store) and store.meta.get("model") == model_name:
+                stores.append(store)
+        return stores
+
+    def _pool(self, stores, topic_vector, rng):
+        """Return the candidate (store index, row) pairs, at most pool_size of them."""
+        total = sum(len(store) for store in stores)
+        if total <= self.pool_size:
+            return [(s, row) for s, store in enumerate(stores) for row in range(len(store))]
+        if topic_vector is not None:
+            hits = []
+            for s, store in enumerate(stores):
+                hits.extend(
+                    (score, s, doc.metadata["chunk_id"])
+                    for doc, score in store.similarity_search_with_score_by_vector(topic_vector, k=self.pool_size)
+                )
+            hits.sort(key=lambda hit: hit[0])
+            return sorted((s, row) for _, s, row in hits[:self.pool_size])
+        # Uniform sample across all documents, in document order.
+        picks = np.sort(rng.choice(total, size=self.pool_size, replace=False))
+        starts = np.cumsum([0] + [len(store) for store in stores])
+        owners = np.searchsorted(starts, picks, side="right") - 1
+        return [(int(s), int(pick - starts[s])) for s, pick in zip(owners, picks)]
+
+    def _select(self, vectors, relevance, lengths, budget):
+        """Greedy MMR under a length budget; returns indexes into the pool."""
+        available = lengths <= budget
+        redundancy = np.zeros(len(vectors), dtype=np.float32)
+        selected = []
+        used = 0
+        while available.any():
+            scores = self.mmr_lambda * relevance - (1.0 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(np.where(available, scores, -np.inf)))
+            selected.append(best)
+            used += int(lengths[best])
+            available[best] = False
+            available &= lengths <= budget - used
+            redundancy = np.maximum(redundancy, vectors @ vectors[best])
+        return selected
+
+    def sample(self, username, doc_ids, topic=None, seed=0, budget_tokens=None):
+        """
+        Build a prompt context from a user's indexed documents.
+
+        Args:
+            username (str): The user whose document indexes are read
+            doc_ids (list): The documents to sample from
+            topic (str, optional): Favor chunks close to this topic
+            seed (int): Varies the sample between calls, e.g. the regeneration count
+            budget_tokens (int, optional): Size limit of the context, defaults to CONTEXT_SAMPLE_TOKENS
+
+        Returns:
+            str: The chosen chunks in document order, or None if nothing is indexed
+        """
+        if not doc_ids:
+            return None
+        embeddings = get_embeddings()
+        stores = self._stores(username, doc_ids, embeddings.model_name)
+        if not stores:
+            return None
+        rng = np.random.default_rng(seed)
+        topic_vector = embeddings.embed_query(topic) if topic else None
+
+        pool = self._pool(stores, topic_vector, rng)
+        texts = [stores[s].text(row) for s, row in pool]
+        vectors = _normalize_rows(np.vstack([
+            stores[s].approximate_vectors([row]) for s, row in pool
+        ]))
+        if topic_vector is not None:
+            target = np.asarray(topic_vector, dtype=np.float32)
+        else:
+            target = vectors.mean(axis=0)
+        norm = float(np.linalg.norm(target))
+        relevance = vectors @ (target / norm if norm else target)
+        if seed:
+            # Small jitter so repeated requests cover other, equally good chunks.
+            relevance = relevance + rng.normal(0.0, 0.05, size=len(relevance)).astype(np.float32)
+
+        lengths = np.array([estimate_tokens(text) for text in texts])
+        selected = sorted(self._select(vectors, relevance, lengths, budget_tokens or self.budget_tokens))
+        logger.info(f"Sampled {len(selected)} of {len(pool)} candidate chunks ({int(lengths[selected].sum())} tokens).")
+        return "\n\n".join(texts[i] for i in selected)
+
+    def context_for(self, context, username=None, doc_ids=None, topic=None, seed=0):
+        """
+        Return a sampled context when the documents are indexed, else the full text.
+
+        context is the full text, or a function returning it, so callers that
+        don't hold the text only assemble it when sampling isn't possible.
+        """
+        if doc_ids:
+            try:
+                sampled = self.sample(username, doc_ids, topic=topic, seed=seed)
+                if sampled:
+                    return sampled
+            except Exception as e:
+                logger.error(f"Error sampling context: {str(e)}")
+        return context() if callable(context) else context
+
+# Create singleton instance
+context_sampler = ContextSampler()
@@ -0,0 +1,151 @@
+import threading
+from services.context_sampler import estimate_tokens
+from services.llm_gateway import llm_gateway
+from utils.logging_config import logger
+from config.settings import CHAT_HISTORY_TOKENS, CHAT_SUMMARY_TOKENS, CHARS_PER_TOKEN
+
+SOURCES_MARKER = "\n\n*Sources:"
+
+SUMMARY_PROMPT = """
+You are keeping notes on a study conversation between a student and an assistant about their documents.
+Update the running summary with the new exchanges below. Keep what the student asked about, the key facts
+of the answers and anything later questions may refer back to. Stay under {words} words.
+
+Summary so far:
+{summary}
+
+New exchanges:
+{turns}
+
+Updated summary:
+"""
+
+def _format_turns(turns):
+    return "\n".join(f"Student: {question}\nAssistant: {answer}" for question, answer in turns)
+
+class ConversationMemory:
+    """
+    Bounded memory of one chat session.
+
+    The most recent turns are kept verbatim up to a token budget. Once the
+    window outgrows it, the oldest turns are evicted down to half the budget
+    and folded into a running summary on a background thread, so a summary
+    call happens every few turns rather than every turn, and never while an
+    answer is waiting. The history added to each prompt stays the same size
+    however long the conversation gets.
+    """
+
+    def __init__(self, history_tokens=CHAT_HISTORY_TOKENS, summary_tokens=CHAT_SUMMARY_TOKENS):
+        """Initialize the ConversationMemory class."""
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        # (question, answer) pairs still in the window, oldest first
+        self.turns = []
+        # Evicted turns not yet folded into the summary
+        self.pending = []
+        # Every exchange seen so far, including those folded into the summary or skipped
+        self.turn_count = 0
+        self._lock = threading.Lock()
+        self._folding = False
+
+    @classmethod
+    def from_messages(cls, messages, **kwargs):
+        """Rebuild the memory of a saved chat from its list of {"role", "content"} messages."""
+        memory = cls(**kwargs)
+        question = None
+        for message in messages:
+            if message.get("role") == "user":
+                question = message.get("content", "")
+            elif message.get("role") == "assistant":
+                if question is not None:
+                    memory.turns.append((question, message.get("content", "").split(SOURCES_MARKER)[0]))
+                memory.turn_count += 1
+                question = None
+        memory._compress()
+        return memory
+
+    def __len__(self):
+        return self.turn_count
+
+    def _window_tokens(self):
+        return sum(estimate_tokens(question) + estimate_tokens(answer) for question, answer in self.turns)
+
+    def add_turn(self, question, answer):
+        """Record a finished exchange, compressing older turns if the window is over budget."""
+        with self._lock:
+            self.turns.append((question, answer.split(SOURCES_MARKER)[0]))
+            self.turn_count += 1
+        self._compress()
+
+    def skip_turn(self):
+        """Count an exchange that produced no answer worth remembering, e.g. an error."""
+        with self._lock:
+            self.turn_count += 1
+
+    def _compress(self):
+        """Once the window is over budget, evict the oldest turns down to half of it and fold them in the background."""
+        with self._lock:
+            if self._window_tokens() <= self.history_tokens:
+                return
+            # The latest turn always stays verbatim; follow-ups mostly refer to it.
+            while len(self.turns) > 1 and self._window_tokens() > self.history_tokens // 2:
+                self.pending.append(self.turns.pop(0))
+            if self._folding:
+                # The running fold picks these up when it finishes.
+                return
+            self._folding = True
+        threading.Thread(target=self._fold, name="chat-memory", daemon=True).start()
+
+    def _fold(self):
+        """Summarize pending turns until none are left."""
+        while True:
+            with self._lock:
+                evicted, self.pending = self.pending, []
+                summary = self.summary
+                if not evicted:
+                    self._folding = False
+                    return
+            prompt = SUMMARY_PROMPT.format(
+                words=self.summary_tokens * 3 // 4,
+                summary=summary or "(none yet)",
+                turns=self._clip(_format_turns(evicted), self.history_tokens)
+            )
+            try:
+                summary = llm_gateway.generate(prompt, service="chat_memory")
+            except Exception as e:
+                logger.error(f"Error summarizing conversation: {str(e)}")
+                summary = None
+            if summary:
+                with self._lock:
+                    self.summary = self._clip(summary.strip(), self.summary_tokens * 2)
+                logger.info(f"Folded {len(evicted)} chat turns into the conversation summary.")
+            else:
+                # Keep the memory bounded even without a new summary; those turns are dropped.
+                logger.warning(f"Dropped {len(evicted)} chat turns without summarizing them.")
+
+    @staticmethod
+    def _clip(text, tokens):
+        limit = tokens * CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + " ..."
+
+    def prompt_history(self):
+        """Return the conversation so far as prompt text, or "" for a new conversation."""
+        with self._lock:
+            summary, pending, turns = self.summary, list(self.pending), list(self.turns)
+        parts = []
+        if summary:
+            parts.append(f"Summary of the earlier conversation: {summary}")
+        if pending:
+            # Turns still being folded in stand in for their summary, at its size.
+            parts.append(self._clip(_format_turns(pending), self.summary_tokens))
+        if turns:
+            parts.append(self._clip(_format_turns(turns), self.history_tokens))
+        return "\n\n".join(parts)
+
+    def retrieval_query(self, question):
+        """Search query for a question, with the previous question added so follow-ups find their subject."""
+        with self._lock:
+            if not self.turns:
+                return question
+            return f"{self.turns[-1][0]}\n{question}"
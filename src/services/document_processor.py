@@ -1,51 +1,278 @@
-from PyPDF2 import PdfReader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
+import hashlib
+import os
+from services.chunk_metadata import COLUMNS, ChunkMetadata
+from services.extraction_engine import PageRecord, extract_pages, read_pdf_bytes
+from services.extraction_cache import extraction_cache
+from services.embedding_service import get_embeddings
+from services.namespaces import document_id, namespace_path
+from services.streaming_chunker import StreamingChunker
+from services.vector_index import VectorIndex, VectorIndexWriter, chunk_hash
 from utils.logging_config import logger
-from config.settings import MAX_PAGES, MAX_CHARS, CHUNK_SIZE, CHUNK_OVERLAP
+from config.settings import (
+    MAX_PAGES, MAX_CHARS,
+    EXTRACTION_WORKERS, EXTRACTION_PAGES_PER_TASK, EXTRACTION_PARALLEL_MIN_PAGES, INGEST_BATCH_CHUNKS,
+    PDF_BACKEND
+)
+
+def _cached_documents(pdf_docs):
+    """Hash each upload and look its pages up in the extraction cache."""
+    documents = []
+    seen = set()
+    for pdf in pdf_docs:
+        data = read_pdf_bytes(pdf)
+        digest = hashlib.sha256(data).hexdigest()
+        if digest in seen:
+            logger.info(f"Skipping duplicate upload {getattr(pdf, 'name', digest)}.")
+            continue
+        seen.add(digest)
+        pages = extraction_cache.get(digest, PDF_BACKEND)
+        documents.append({
+            "name": getattr(pdf, "name", None),
+            "doc_id": document_id(digest),
+            "digest": digest,
+            # Cached documents are read back page by page; only misses keep their bytes for extraction.
+            "data": data if pages is None else None,
+            "pages": pages,
+            "page_count": extraction_cache.page_count(digest, PDF_BACKEND) if pages is not None else None,
+        })
+    return documents
+
+def _ordered_pages(documents, records):
+    """Interleave cached pages with freshly extracted ones in upload order, caching the latter as they pass."""
+    position = 0
+
+    def finish(document):
+        if document["cached"]:
+            for page_no, text in document["pages"]:
+                yield PageRecord(document["doc_id"], page_no, text)
+        else:
+            # Only reached once the engine has moved past this document, so
+            # its pages are complete and safe to publish.
+            document["writer"].commit()
+            document["writer"] = None
+
+    try:
+        for record in records:
+            while position < record.doc:
+                yield from finish(documents[position])
+                position += 1
+            documents[position]["writer"].add(record.page_no, record.text)
+            yield PageRecord(documents[position]["doc_id"], record.page_no, record.text)
+        while position < len(documents):
+            yield from finish(documents[position])
+            position += 1
+    finally:
+        # Documents cut short, e.g. by MAX_CHARS, must not be cached as complete.
+        for document in documents:
+            if document.get("writer") is not None:
+                document["writer"].abort()
+
+def iter_pdf_pages(pdf_docs, document_names=None, page_counts=None):
+    """
+    Yield (doc_id, page_no, text) records for the uploaded PDF documents.
+
+    Args:
+        pdf_docs (list): The uploaded PDF files
+        document_names (dict, optional): Filled with doc_id -> upload file name
+        page_counts (dict, optional): Filled with doc_id -> number of pages to read,
+            from the cache for hits and as the engine opens each miss
+    """
+    documents = _cached_documents(pdf_docs)
+    if document_names is not None:
+        document_names.update((document["doc_id"], document["name"]) for document in documents)
+    if page_counts is not None:
+        page_counts.update(
+            (document["doc_id"], document["page_count"])
+            for document in documents if document["page_count"] is not None
+        )
+    misses = []
+    for position, document in enumerate(documents):
+        document["cached"] = document["pages"] is not None
+        if not document["cached"]:
+            document["writer"] = extraction_cache.writer(document["digest"], PDF_BACKEND)
+            misses.append((position, document.pop("data")))
+    logger.info(f"Extraction cache: {len(documents) - len(misses)} hits, {len(misses)} misses.")
+
+    def opened(position, count):
+        if page_counts is not None:
+            page_counts[documents[position]["doc_id"]] = count
+
+    records = extract_pages(
+        misses,
+        max_pages=MAX_PAGES,
+        max_chars=MAX_CHARS,
+        workers=EXTRACTION_WORKERS,
+        pages_per_task=EXTRACTION_PAGES_PER_TASK,
+        parallel_min_pages=EXTRACTION_PARALLEL_MIN_PAGES,
+        backend=PDF_BACKEND,
+        on_page_count=opened,
+    )
+    pages = _ordered_pages(documents, records)
+    remaining = MAX_CHARS
+    try:
+        for record in pages:
+            if len(record.text) >= remaining:
+                yield record._replace(text=record.text[:remaining])
+                return
+            remaining -= len(record.text)
+            yield record
+    finally:
+        pages.close()
+        records.close()
 
 def get_pdf_text(pdf_docs):
     """Extract text from uploaded PDF documents."""
-    text = ""
-    for pdf in pdf_docs:
-        pdf_reader = PdfReader(pdf)
-        for i, page in enumerate(pdf_reader.pages):
-            if i >= MAX_PAGES:
-                break
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text
-                if len(text) > MAX_CHARS:
-                    text = text[:MAX_CHARS]
-                    return text
-    
+    text = "".join(record.text for record in iter_pdf_pages(pdf_docs))
     logger.info(f"Extracted text length: {len(text)}")
     return text
 
-def get_text_chunks(text):
-    """Split the extracted text into manageable chunks."""
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE, 
-        chunk_overlap=CHUNK_OVERLAP
-    )
-    chunks = text_splitter.split_text(text)
-    return chunks
+class DocumentIndexer:
+    """
+    Stream one document's chunks into its vector index.
 
-def update_vector_store(text_chunks):
-    """Update the FAISS vector store with new text chunks."""
-    embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-    try:
-        vector_store = FAISS.load_local(
-            "faiss_index", 
-            embeddings, 
-            allow_dangerous_deserialization=True
+    Chunks are embedded and written in batches of INGEST_BATCH_CHUNKS as they
+    arrive, so embedding overlaps extraction and only one batch is held in
+    memory. Chunks the index already has are skipped; the new version is
+    published by finish().
+    """
+
+    def __init__(self, username, doc_id, name=None):
+        self.doc_id = doc_id
+        self.name = name
+        self.path = namespace_path(username, doc_id)
+        self.embeddings = get_embeddings()
+        self.chunker = StreamingChunker()
+        self.added = 0
+        self._writer = None
+        self._pending = []
+        self._seen = set()
+
+        if os.path.exists(os.path.join(self.path, "meta.json")):
+            current = VectorIndex.open(self.path)
+            self._seen.update(current.hash_ids())
+            if current.meta.get("model") != self.embeddings.model_name:
+                # Vectors from another embedding model can't be mixed in; re-embed everything.
+                logger.info(f"Re-embedding document {doc_id} with {self.embeddings.model_name}.")
+                self._writer = VectorIndexWriter(self.path, self.embeddings.model_name, replace=True)
+                try:
+                    for i in range(len(current)):
+                        row = current.chunk_metadata.row(i)
+                        self._pending.append((current.text(i), current.hashes[i].decode("ascii"), row))
+                        if len(self._pending) >= INGEST_BATCH_CHUNKS:
+                            self._write_batch()
+                except Exception:
+                    self.abort()
+                    raise
+
+    def add_page(self, page_no, text):
+        """Feed the next page of the document."""
+        for chunk in self.chunker.feed(page_no, text):
+            self._add(chunk.text, chunk._asdict())
+
+    def _add(self, text, row):
+        digest = chunk_hash(text)
+        if digest in self._seen:
+            return
+        self._seen.add(digest)
+        self._pending.append((text, digest, row))
+        if len(self._pending) >= INGEST_BATCH_CHUNKS:
+            self._write_batch()
+
+    def _write_batch(self):
+        if not self._pending:
+            return
+        texts = [text for text, _, _ in self._pending]
+        vectors = self.embeddings.embed_documents(texts)
+        if self._writer is None:
+            self._writer = VectorIndexWriter(self.path, self.embeddings.model_name)
+        self._writer.add(
+            vectors, texts, [digest for _, digest, _ in self._pending],
+            ChunkMetadata(**{column: [row[column] for _, _, row in self._pending] for column, _ in COLUMNS}),
         )
-        vector_store.add_texts(text_chunks)
-        logger.info("Added new text chunks to existing FAISS index.")
-    except:
-        vector_store = FAISS.from_texts(text_chunks, embeddings)
-        logger.info("Created new FAISS index from text chunks.")
-    
-    vector_store.save_local("faiss_index")
-    logger.info("FAISS index saved locally.")
+        self.added += len(texts)
+        self._pending = []
+
+    def finish(self):
+        """
+        Flush the last chunks and publish the new index version.
+
+        Returns:
+            int: Number of chunks embedded
+        """
+        try:
+            for chunk in self.chunker.flush():
+                self._add(chunk.text, chunk._asdict())
+            self._write_batch()
+        except Exception:
+            self.abort()
+            raise
+        if self._writer is None:
+            logger.info(f"All text chunks of document {self.doc_id} are already indexed, nothing to embed.")
+            return 0
+        self._writer.commit(doc_id=self.doc_id, name=self.name)
+        self._writer = None
+        logger.info(f"Added {self.added} text chunks to the vector index at {self.path}.")
+        return self.added
+
+    def abort(self):
+        """Discard anything written so far."""
+        if self._writer is not None:
+            self._writer.abort()
+            self._writer = None
+
+def process_documents(pdf_docs, username=None, progress=None, published=None, page_counts=None):
+    """
+    Extract, split and index uploaded PDFs, one index namespace per document.
+
+    Pages stream from extraction straight into the chunker and the document's
+    index, so the full text is never held in memory.
+
+    Args:
+        pdf_docs (list): The uploaded PDF files
+        username (str, optional): The user the documents are indexed for
+        progress (callable, optional): Called as progress(pages_extracted, chunks_embedded)
+            after every page and once more when a document is published
+        published (dict, optional): Filled with doc_id -> file name as each document's
+            index is published, so a caller still knows them if a later document fails
+        page_counts (dict, optional): Filled with doc_id -> number of pages to read as
+            each document is looked up or opened, so progress can be shown against a total
+
+    Returns:
+        dict: Document ID -> file name of every indexed document
+    """
+    if published is None:
+        published = {}
+    names = {}
+    indexed = []
+    indexer = None
+    pages = 0
+    embedded = 0
+
+    def report():
+        if progress is not None:
+            progress(pages, embedded + (indexer.added if indexer is not None else 0))
+
+    try:
+        for record in iter_pdf_pages(pdf_docs, names, page_counts):
+            if indexer is None or indexer.doc_id != record.doc:
+                if indexer is not None:
+                    embedded += indexer.finish()
+                    published[indexer.doc_id] = names.get(indexer.doc_id)
+                    indexer = None
+                    report()
+                indexer = DocumentIndexer(username, record.doc, names.get(record.doc))
+                indexed.append(record.doc)
+            indexer.add_page(record.page_no, record.text)
+            pages += 1
+            report()
+        if indexer is not None:
+            embedded += indexer.finish()
+            published[indexer.doc_id] = names.get(indexer.doc_id)
+            indexer = None
+            report()
+    finally:
+        if indexer is not None:
+            indexer.abort()
+
+    logger.info(f"Indexed {len(indexed)} documents.")
+    return {doc_id: names.get(doc_id) for doc_id in indexed}
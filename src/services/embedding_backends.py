@@ -0,0 +1,124 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.logging_config import logger
+from config.settings import (
+    EMBEDDING_MODEL, LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_BATCH_SIZE, LOCAL_EMBEDDING_THREADS
+)
+
+class EmbeddingBackend(Embeddings):
+    """
+    Interface of an embedding backend.
+
+    Backends embed with embed_documents/embed_query like any LangChain
+    embedder and describe themselves with:
+        model_name  key the vectors are cached and indexed under
+        remote      whether calls go over the network (and are rate limited)
+    """
+
+    model_name = None
+    remote = False
+
+    def warm(self):
+        """Load whatever the backend needs before the first call."""
+
+class GoogleEmbeddingBackend(EmbeddingBackend):
+    """Gemini embedding API."""
+
+    remote = True
+
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        self.model_name = model_name
+        self._client = GoogleGenerativeAIEmbeddings(model=model_name)
+
+    def embed_documents(self, texts):
+        return self._client.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self._client.embed_query(text)
+
+_local_models = {}
+_local_models_lock = threading.Lock()
+
+def _load_local_model(model_name):
+    """Load a sentence-transformers model once per process."""
+    with _local_models_lock:
+        model = _local_models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name, device="cpu")
+            _local_models[model_name] = model
+            logger.info(f"Loaded local embedding model {model_name}")
+        return model
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """sentence-transformers model run on the local CPU."""
+
+    def __init__(self, model_name=LOCAL_EMBEDDING_MODEL, batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+                 threads=LOCAL_EMBEDDING_THREADS):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="embed")
+
+    def warm(self):
+        self._executor.submit(_load_local_model, self.model_name)
+
+    def _encode(self, texts):
+        return _load_local_model(self.model_name).encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        ).astype(np.float32)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        # Torch releases the GIL while encoding, so shards run in parallel.
+        shard = max(self.batch_size, -(-len(texts) // self.threads))
+        shards = [texts[i:i + shard] for i in range(0, len(texts), shard)]
+        return np.concatenate(list(self._executor.map(self._encode, shards))).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+class HashEmbeddings(EmbeddingBackend):
+    """Deterministic local stand-in embedder derived from token hashes, for tests and offline use."""
+
+    def __init__(self, dimension=256):
+        self.dimension = dimension
+        self.model_name = f"hash-{dimension}"
+        self.calls = 0
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in text.lower().split():
+            digest = hashlib.md5(token.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return self._embed(text)
+
+BACKENDS = {
+    "google": GoogleEmbeddingBackend,
+    "local": LocalEmbeddingBackend,
+    "hash": HashEmbeddings,
+}
+
+def create_backend(name):
+    """Instantiate the embedding backend registered under name."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
@@ -0,0 +1,170 @@
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from services.embedding_backends import create_backend
+from utils.logging_config import logger
+from utils.rate_limiter import TokenBucket
+from config.settings import (
+    EMBEDDING_BACKEND, EMBEDDING_CACHE_PATH, EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY, EMBEDDING_REQUESTS_PER_MINUTE
+)
+
+def text_hash(text):
+    """Hash identifying a text in the embedding cache."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that batches texts, embeds batches concurrently under a
+    rate limit and keeps every vector in SQLite keyed by (model, text hash).
+    """
+
+    def __init__(self, base, model_name=None, db_path=EMBEDDING_CACHE_PATH,
+                 batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY,
+                 requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE):
+        """Initialize the CachedEmbeddings class."""
+        self.base = base
+        self.model_name = model_name or base.model_name
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate_limiter = TokenBucket(requests_per_minute)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.create_embedding_table()
+
+    def create_embedding_table(self):
+        """Create the table for cached embedding vectors if it doesn't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS embeddings(
+                model TEXT,
+                text_hash TEXT,
+                vector BLOB,
+                PRIMARY KEY (model, text_hash)
+            )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating embedding cache table: {str(e)}")
+
+    def _lookup(self, hashes, model=None):
+        model = model or self.model_name
+        found = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            # Stay well below SQLite's bound-parameter limit.
+            for start in range(0, len(hashes), 500):
+                batch = hashes[start:start + 500]
+                c.execute(
+                    f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({",".join("?" * len(batch))})',
+                    [model, *batch]
+                )
+                for h, blob in c.fetchall():
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading embedding cache: {str(e)}")
+        return found
+
+    def _store(self, vectors, model=None):
+        model = model or self.model_name
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.executemany(
+                'INSERT OR REPLACE INTO embeddings(model, text_hash, vector) VALUES (?, ?, ?)',
+                [(model, h, np.asarray(v, dtype=np.float32).tobytes()) for h, v in vectors.items()]
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error writing embedding cache: {str(e)}")
+
+    def _embed_batch(self, texts):
+        self.rate_limiter.acquire()
+        return self.base.embed_documents(texts)
+
+    def embed_documents(self, texts):
+        """Embed texts, only sending texts without a cached vector to the model."""
+        hashes = [text_hash(text) for text in texts]
+        cached = self._lookup(list(set(hashes)))
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in cached:
+                missing.setdefault(h, text)
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            pending = list(missing.items())
+            batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            logger.info(f"Embedding {len(pending)} uncached texts in {len(batches)} batches.")
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+                results = executor.map(self._embed_batch, [[text for _, text in batch] for batch in batches])
+                fresh = {}
+                for batch, vectors in zip(batches, results):
+                    for (h, _), vector in zip(batch, vectors):
+                        fresh[h] = np.asarray(vector, dtype=np.float32)
+            self._store(fresh)
+            cached.update(fresh)
+
+        return [cached[h].tolist() for h in hashes]
+
+    def embed_query(self, text):
+        """Embed a query, reusing the cached vector for repeated questions."""
+        # Query vectors are embedded with a different task type than
+        # documents, so they are cached under their own key.
+        model = f"{self.model_name}#query"
+        h = text_hash(text)
+        cached = self._lookup([h], model)
+        if h in cached:
+            with self._lock:
+                self.hits += 1
+            return cached[h].tolist()
+        with self._lock:
+            self.misses += 1
+        self.rate_limiter.acquire()
+        vector = np.asarray(self.base.embed_query(text), dtype=np.float32)
+        self._store({h: vector}, model)
+        return vector.tolist()
+
+    def stats(self):
+        """Return embedding cache hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings():
+    """Return the shared cached embedder for the configured embedding backend."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            backend = create_backend(EMBEDDING_BACKEND)
+            backend.warm()
+            if backend.remote:
+                _embeddings = CachedEmbeddings(backend, backend.model_name)
+            else:
+                # Local backends parallelize internally and have no quota.
+                _embeddings = CachedEmbeddings(
+                    backend, backend.model_name,
+                    batch_size=10 ** 6, concurrency=1, requests_per_minute=None
+                )
+        return _embeddings
@@ -0,0 +1,242 @@
+import sqlite3
+import threading
+import time
+import zlib
+from utils.logging_config import logger
+from config.settings import (
+    EXTRACTION_CACHE_PATH, EXTRACTION_CACHE_MAX_BYTES, EXTRACTION_CACHE_WRITE_PAGES, PDF_BACKEND
+)
+
+# Age after which an incomplete document is taken to be left over from an interrupted write.
+_STALE_WRITE_SECONDS = 60 * 60
+
+def _cache_key(digest, backend):
+    # Backends disagree on whitespace and reading order, so their output is cached separately.
+    return f"{backend}:{digest}"
+
+class CacheWriter:
+    """
+    Write a document's pages to the cache as they are extracted.
+
+    Pages are flushed every EXTRACTION_CACHE_WRITE_PAGES pages, so only that
+    many are held in memory. The document becomes visible to get() once
+    commit() marks it complete; abort() removes what was written.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self.size = 0
+        self._pending = []
+        self._started = False
+
+    def add(self, page_no, text):
+        """Queue one extracted page."""
+        blob = zlib.compress(text.encode("utf-8"))
+        self._pending.append((self.key, page_no, blob))
+        self.size += len(blob)
+        if len(self._pending) >= self.cache.write_pages:
+            self._flush()
+
+    def _flush(self, complete=False):
+        conn = sqlite3.connect(self.cache.db_path)
+        try:
+            c = conn.cursor()
+            if not self._started:
+                # Replace anything left by an earlier, interrupted write of the same document.
+                c.execute('DELETE FROM extracted_page_text WHERE digest = ?', (self.key,))
+                self._started = True
+            c.executemany('''
+            INSERT OR REPLACE INTO extracted_page_text(digest, page_no, text) VALUES (?, ?, ?)
+            ''', self._pending)
+            c.execute('''
+            INSERT OR REPLACE INTO extracted_documents(digest, complete, size, last_access) VALUES (?, ?, ?, ?)
+            ''', (self.key, int(complete), self.size, time.time()))
+            if complete:
+                self.cache._evict(c)
+            conn.commit()
+        finally:
+            conn.close()
+        self._pending = []
+
+    def commit(self):
+        """Flush the remaining pages and mark the document complete."""
+        try:
+            self._flush(complete=True)
+        except Exception as e:
+            logger.error(f"Error writing extraction cache: {str(e)}")
+            self.abort()
+
+    def abort(self):
+        """Forget the pages written so far, e.g. when extraction stopped early."""
+        self._pending = []
+        if self._started:
+            self.cache._delete(self.key)
+
+class ExtractionCache:
+    """Persistent per-page text cache keyed by the SHA-256 of the PDF bytes and the extraction backend."""
+
+    def __init__(self, db_path=EXTRACTION_CACHE_PATH, max_bytes=EXTRACTION_CACHE_MAX_BYTES,
+                 write_pages=EXTRACTION_CACHE_WRITE_PAGES):
+        """Initialize the ExtractionCache class."""
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.write_pages = write_pages
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.create_cache_table()
+
+    def create_cache_table(self):
+        """Create the tables holding compressed page text if they don't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS extracted_documents(
+                digest TEXT PRIMARY KEY,
+                complete INTEGER,
+                size INTEGER,
+                last_access REAL
+            )
+            ''')
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS extracted_page_text(
+                digest TEXT,
+                page_no INTEGER,
+                text BLOB,
+                PRIMARY KEY (digest, page_no)
+            )
+            ''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_extracted_documents_access ON extracted_documents(last_access)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating extraction cache table: {str(e)}")
+
+    def get(self, digest, backend=PDF_BACKEND):
+        """
+        Look up the extracted pages of a document.
+
+        Args:
+            digest (str): SHA-256 hex digest of the PDF bytes
+            backend (str): PDF backend the pages were extracted with
+
+        Returns:
+            iterator: (page_no, text) pairs read from disk as they are consumed, or None on a cache miss
+        """
+        key = _cache_key(digest, backend)
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('SELECT 1 FROM extracted_documents WHERE digest = ? AND complete = 1', (key,))
+            found = c.fetchone() is not None
+            if found:
+                c.execute('UPDATE extracted_documents SET last_access = ? WHERE digest = ?', (time.time(), key))
+                conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading extraction cache: {str(e)}")
+            found = False
+
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return self._pages(key) if found else None
+
+    def _pages(self, key):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # The cursor fetches rows lazily, so one page is decompressed at a time.
+            for page_no, blob in conn.execute(
+                'SELECT page_no, text FROM extracted_page_text WHERE digest = ? ORDER BY page_no', (key,)
+            ):
+                yield page_no, zlib.decompress(blob).decode("utf-8")
+        finally:
+            conn.close()
+
+    def page_count(self, digest, backend=PDF_BACKEND):
+        """Return the number of cached pages of a complete document, or None if it isn't cached."""
+        key = _cache_key(digest, backend)
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            # Counted from the (digest, page_no) primary key, without reading the page text.
+            c.execute('''
+            SELECT COUNT(p.page_no) FROM extracted_documents d
+            LEFT JOIN extracted_page_text p ON p.digest = d.digest
+            WHERE d.digest = ? AND d.complete = 1 GROUP BY d.digest
+            ''', (key,))
+            row = c.fetchone()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading extraction cache: {str(e)}")
+            return None
+        return row[0] if row else None
+
+    def writer(self, digest, backend=PDF_BACKEND):
+        """Return a CacheWriter that stores a document's pages while they are extracted."""
+        return CacheWriter(self, _cache_key(digest, backend))
+
+    def _delete(self, key):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('DELETE FROM extracted_page_text WHERE digest = ?', (key,))
+            c.execute('DELETE FROM extracted_documents WHERE digest = ?', (key,))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error deleting from extraction cache: {str(e)}")
+
+    def _evict(self, c):
+        """Drop least recently used documents until the cache fits in max_bytes."""
+        # An incomplete document nobody has flushed to for a while was left by an
+        # interrupted write; live writers refresh last_access on every flush.
+        stale = (time.time() - _STALE_WRITE_SECONDS,)
+        c.execute('''
+        DELETE FROM extracted_page_text WHERE digest IN (
+            SELECT digest FROM extracted_documents WHERE complete = 0 AND last_access < ?
+        )
+        ''', stale)
+        c.execute('DELETE FROM extracted_documents WHERE complete = 0 AND last_access < ?', stale)
+        c.execute('SELECT COALESCE(SUM(size), 0) FROM extracted_documents')
+        total = c.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        c.execute('SELECT digest, size FROM extracted_documents WHERE complete = 1 ORDER BY last_access ASC')
+        evicted = []
+        for digest, size in c.fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((digest,))
+            total -= size
+        c.executemany('DELETE FROM extracted_page_text WHERE digest = ?', evicted)
+        c.executemany('DELETE FROM extracted_documents WHERE digest = ?', evicted)
+        logger.info(f"Evicted {len(evicted)} documents from the extraction cache.")
+
+    def stats(self):
+        """Return hit/miss counters and the current cache size."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extracted_documents WHERE complete = 1')
+            documents, size = c.fetchone()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading extraction cache stats: {str(e)}")
+            documents, size = 0, 0
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "documents": documents,
+                "bytes": size,
+            }
+
+# Create singleton instance
+extraction_cache = ExtractionCache()
@@ -0,0 +1,186 @@
+import atexit
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from services.pdf_backends import get_backend
+from utils.logging_config import logger
+
+# One extracted page: the document it came from, its zero-based page number
+# and the page text.
+PageRecord = namedtuple("PageRecord", ["doc", "page_no", "text"])
+
+_pool = None
+_pool_workers = 0
+# Ingestion jobs and sessions extract concurrently; only one of them may start or replace the pool.
+_pool_lock = threading.Lock()
+
+# Documents opened inside a worker process, keyed by backend and spooled file
+# path, so consecutive page ranges of the same document don't re-parse the
+# xref table.
+_worker_readers = {}
+_WORKER_READER_LIMIT = 4
+
+
+def _worker_reader(backend, path):
+    key = (backend.name, path)
+    reader = _worker_readers.get(key)
+    if reader is None:
+        if len(_worker_readers) >= _WORKER_READER_LIMIT:
+            old_key = next(iter(_worker_readers))
+            get_backend(old_key[0]).close(_worker_readers.pop(old_key))
+        reader = backend.open(path)
+        _worker_readers[key] = reader
+    return reader
+
+
+def _extract_page_range(backend_name, path, start, stop):
+    """Extract pages [start, stop) of the PDF at path (runs in a worker process)."""
+    backend = get_backend(backend_name)
+    reader = _worker_reader(backend, path)
+    return [(i, backend.page_text(reader, i)) for i in range(start, stop)]
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(cancel_futures=True)
+            # Streamlit serves sessions from threads, so never fork the script process.
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_workers = workers
+            logger.info(f"Started PDF extraction pool with {workers} workers.")
+        return _pool
+
+
+@atexit.register
+def shutdown_pool():
+    """Stop the shared extraction pool, if one was started."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+            _pool_workers = 0
+
+
+def read_pdf_bytes(pdf):
+    """Return the raw bytes of an uploaded file, file object or bytes."""
+    if isinstance(pdf, (bytes, bytearray)):
+        return bytes(pdf)
+    if hasattr(pdf, "getvalue"):
+        return pdf.getvalue()
+    pdf.seek(0)
+    return pdf.read()
+
+
+def _serial_records(documents, max_pages, backend):
+    for doc, data in documents:
+        reader = backend.open(data)
+        try:
+            for i in range(min(backend.page_count(reader), max_pages)):
+                yield PageRecord(doc, i, backend.page_text(reader, i))
+        finally:
+            backend.close(reader)
+
+
+def _pooled_records(documents, page_counts, max_pages, workers, pages_per_task, backend):
+    pool = _get_pool(workers)
+    paths = []
+    tasks = []
+    pending = deque()
+    try:
+        for (doc, data), page_count in zip(documents, page_counts):
+            fd, path = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, "wb") as spooled:
+                spooled.write(data)
+            paths.append(path)
+            limit = min(page_count, max_pages)
+            for start in range(0, limit, pages_per_task):
+                tasks.append((doc, path, start, min(start + pages_per_task, limit)))
+
+        # Keep a bounded window of tasks in flight and consume them in order,
+        # so a caller that stops early (character budget reached) leaves
+        # little wasted work behind.
+        next_task = 0
+        window = workers * 2
+        while pending or next_task < len(tasks):
+            while next_task < len(tasks) and len(pending) < window:
+                doc, path, start, stop = tasks[next_task]
+                pending.append((doc, pool.submit(_extract_page_range, backend.name, path, start, stop)))
+                next_task += 1
+            doc, future = pending.popleft()
+            for page_no, text in future.result():
+                yield PageRecord(doc, page_no, text)
+    finally:
+        for _, future in pending:
+            future.cancel()
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _page_count(backend, data):
+    reader = backend.open(data)
+    try:
+        return backend.page_count(reader)
+    finally:
+        backend.close(reader)
+
+
+def extract_pages(pdf_docs, max_pages, max_chars, workers=1, pages_per_task=16, parallel_min_pages=64,
+                  backend="pypdf2", on_page_count=None):
+    """
+    Extract page text from PDF documents, fanning pages out to a process pool.
+
+    Args:
+        pdf_docs (list): (doc, pdf) pairs, where pdf is an uploaded file, a
+            file object or raw bytes and doc is the identifier reported back
+        max_pages (int): Maximum number of pages read from each document
+        max_chars (int): Maximum number of characters yielded across all documents
+        workers (int): Size of the extraction process pool
+        pages_per_task (int): Number of pages handed to a worker at a time
+        parallel_min_pages (int): Below this many pages in total, extract in-process
+        backend (str): Name of the PDF backend doing the extraction (see pdf_backends.py)
+        on_page_count (callable, optional): Called as on_page_count(doc, pages) with the
+            number of pages that will be read from each document once it is opened
+
+    Yields:
+        PageRecord: (doc, page_no, text) for every page with text, in document
+        and page order. The last record is truncated once max_chars is reached.
+    """
+    backend = get_backend(backend)
+    documents = [(doc, read_pdf_bytes(pdf)) for doc, pdf in pdf_docs]
+    page_counts = [_page_count(backend, data) for _, data in documents]
+    if on_page_count is not None:
+        for (doc, _), count in zip(documents, page_counts):
+            on_page_count(doc, min(count, max_pages))
+    total_pages = sum(min(count, max_pages) for count in page_counts)
+
+    if workers > 1 and total_pages >= parallel_min_pages:
+        logger.info(f"Extracting {total_pages} pages with {workers} workers.")
+        records = _pooled_records(documents, page_counts, max_pages, workers, pages_per_task, backend)
+    else:
+        records = _serial_records(documents, max_pages, backend)
+
+    remaining = max_chars
+    try:
+        for record in records:
+            if not record.text:
+                continue
+            if len(record.text) >= remaining:
+                yield record._replace(text=record.text[:remaining])
+                logger.info("Character budget reached, stopping extraction.")
+                return
+            remaining -= len(record.text)
+            yield record
+    finally:
+        records.close()
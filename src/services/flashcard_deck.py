@@ -0,0 +1,161 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from services.flashcard_service import flashcard_service
+from services.namespaces import document_set_id
+from utils.logging_config import logger
+from config.settings import FLASHCARD_DECK_PATH, FLASHCARD_PAGE_SIZE, FLASHCARD_BATCH_SIZE
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+def term_fingerprint(term):
+    """Hash of a flashcard term with case, punctuation and spacing ignored."""
+    return hashlib.sha1(" ".join(_NON_WORD.sub(" ", term.lower()).split()).encode("utf-8")).hexdigest()
+
+class FlashcardDeck:
+    """
+    Stored flashcards per document set, handed out a page at a time.
+
+    Cards are generated FLASHCARD_BATCH_SIZE at a time and kept across
+    sessions, so reopening a document or pressing Regenerate reads the next
+    page of the deck; the model is only called once the deck runs out.
+    """
+
+    def __init__(self, db_path=FLASHCARD_DECK_PATH, page_size=FLASHCARD_PAGE_SIZE, batch_size=FLASHCARD_BATCH_SIZE):
+        """Initialize the FlashcardDeck class."""
+        self.db_path = db_path
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self._grow_locks = {}
+        # Document sets the model had no new cards for; they are paged round instead.
+        self._exhausted = set()
+        self._lock = threading.Lock()
+        self.create_deck_table()
+
+    def create_deck_table(self):
+        """Create the table of stored flashcards if it doesn't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS deck_cards(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_set TEXT,
+                fingerprint TEXT,
+                term TEXT,
+                definition TEXT,
+                created_at REAL,
+                UNIQUE (doc_set, fingerprint)
+            )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating flashcard deck table: {str(e)}")
+
+    def _grow_lock(self, doc_set):
+        with self._lock:
+            return self._grow_locks.setdefault(doc_set, threading.Lock())
+
+    def cards(self, doc_ids):
+        """Return every stored card of a document set, in the order they were generated."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            SELECT term, definition FROM deck_cards WHERE doc_set = ? ORDER BY id
+            ''', (document_set_id(doc_ids),))
+            rows = c.fetchall()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading flashcard deck: {str(e)}")
+            return []
+        return [{"term": term, "definition": definition} for term, definition in rows]
+
+    def _add(self, doc_set, flashcards):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            before = conn.total_changes
+            now = time.time()
+            c.executemany('''
+            INSERT OR IGNORE INTO deck_cards(doc_set, fingerprint, term, definition, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ''', [(doc_set, term_fingerprint(card["term"]), card["term"], card["definition"], now) for card in flashcards])
+            added = conn.total_changes - before
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error writing flashcard deck: {str(e)}")
+            return 0
+        return added
+
+    def grow(self, context, username, doc_ids):
+        """
+        Generate one batch of new cards and add them to the deck.
+
+        Returns:
+            tuple: (number of cards added, error message or None)
+        """
+        doc_set = document_set_id(doc_ids)
+        with self._grow_lock(doc_set):
+            known = self.cards(doc_ids)
+            flashcards, error = flashcard_service.generate_flashcards(
+                context,
+                iteration=len(known) // self.batch_size,
+                username=username,
+                doc_ids=doc_ids,
+                count=self.batch_size,
+                avoid=[card["term"] for card in known[-30:]]
+            )
+            if error:
+                return 0, error
+            added = self._add(doc_set, flashcards)
+            if not added and known:
+                with self._lock:
+                    self._exhausted.add(doc_set)
+        logger.info(f"Added {added} cards to the flashcard deck ({len(known) + added} in total).")
+        return added, None
+
+    def ensure(self, context, username, doc_ids):
+        """Make sure the deck holds at least a first page, generating a batch if it doesn't."""
+        if len(self.cards(doc_ids)) >= self.page_size:
+            return 0, None
+        return self.grow(context, username, doc_ids)
+
+    def page(self, context, username, doc_ids, page_no):
+        """
+        Return one page of the deck, generating more cards only when the deck is too short.
+
+        Args:
+            context (str or callable): Full document text, or a function returning it,
+                used when the documents aren't indexed
+            username (str): Owner of the indexes cards are generated from
+            doc_ids (list): The documents of the set
+            page_no (int): Zero-based page, e.g. the number of regenerations so far
+
+        Returns:
+            tuple: (list of flashcards, error message or None)
+        """
+        doc_set = document_set_id(doc_ids)
+        # Wait for a batch being generated, e.g. the one started after processing.
+        with self._grow_lock(doc_set):
+            cards = self.cards(doc_ids)
+        with self._lock:
+            exhausted = doc_set in self._exhausted
+        if not exhausted and len(cards) < (page_no + 1) * self.page_size:
+            _, error = self.grow(context, username, doc_ids)
+            if error and not cards:
+                return [], error
+            cards = self.cards(doc_ids)
+        if not cards:
+            return [], None
+        # Past the end of a deck that can't grow, pages wrap round to the beginning.
+        pages = (len(cards) + self.page_size - 1) // self.page_size
+        start = (page_no % pages) * self.page_size
+        return cards[start:start + self.page_size], None
+
+# Create singleton instance
+flashcard_deck = FlashcardDeck()
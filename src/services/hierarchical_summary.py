@@ -0,0 +1,204 @@
+"""
+Map-reduce summarization for texts too long for a single prompt.
+
+The text is cut into chunks that are summarized in parallel, then the partial
+summaries are combined in tiers of SUMMARY_REDUCE_FANOUT until one remains.
+Every node of the tree is cached under a hash of its inputs: a leaf under the
+hash of its chunk, an inner node under the hashes of its children. Groups are
+filled from the left, so appending a document only recomputes the nodes on
+the right-hand edge of the tree.
+"""
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from services.llm_gateway import llm_gateway
+from services.streaming_chunker import chunk_pages
+from utils.logging_config import logger
+from config.settings import (
+    SUMMARY_CHUNK_CHARS, SUMMARY_REDUCE_FANOUT, SUMMARY_WORKERS, SUMMARY_CACHE_PATH, SUMMARY_CACHE_MAX_BYTES
+)
+
+MAP_PROMPT = """
+Summarize the following part of a longer document. Keep every main point, key term and
+conclusion, and leave out examples and repetition:
+
+{text}
+
+Summary:
+"""
+
+REDUCE_PROMPT = """
+The following are summaries of consecutive parts of a document. Combine them into one concise
+summary that captures the main points and key ideas of the whole, in order:
+
+{text}
+
+Summary:
+"""
+
+def _hash(*parts):
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+class SummaryTree:
+    """Hierarchical summarizer with a persistent, size-bounded LRU cache of tree nodes."""
+
+    def __init__(self, db_path=SUMMARY_CACHE_PATH, chunk_chars=SUMMARY_CHUNK_CHARS,
+                 fanout=SUMMARY_REDUCE_FANOUT, workers=SUMMARY_WORKERS, max_bytes=SUMMARY_CACHE_MAX_BYTES):
+        """Initialize the SummaryTree class."""
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.chunk_chars = chunk_chars
+        self.fanout = max(2, fanout)
+        self.workers = workers
+        self.create_nodes_table()
+
+    def create_nodes_table(self):
+        """Create the table of cached tree nodes if it doesn't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS summary_nodes(
+                key TEXT PRIMARY KEY,
+                tier INTEGER,
+                summary TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL
+            )
+            ''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_summary_nodes_access ON summary_nodes(last_access)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating summary nodes table: {str(e)}")
+
+    def _load(self, keys):
+        """Return the cached summaries among the given node keys."""
+        found = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                c.execute(
+                    f'SELECT key, summary FROM summary_nodes WHERE key IN ({",".join("?" * len(batch))})', batch
+                )
+                found.update(c.fetchall())
+            c.executemany(
+                'UPDATE summary_nodes SET last_access = ? WHERE key = ?', [(time.time(), key) for key in found]
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading summary nodes: {str(e)}")
+        return found
+
+    def _store(self, tier, summaries):
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            now = time.time()
+            c.executemany('''
+            INSERT OR REPLACE INTO summary_nodes(key, tier, summary, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (key, tier, summary, len(summary.encode("utf-8")), now, now) for key, summary in summaries.items()
+            ])
+            self._evict(c)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error writing summary nodes: {str(e)}")
+
+    def _evict(self, c):
+        """Drop least recently used nodes until the cache fits in max_bytes."""
+        c.execute('SELECT COALESCE(SUM(size), 0) FROM summary_nodes')
+        total = c.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        c.execute('SELECT key, size FROM summary_nodes ORDER BY last_access ASC')
+        evicted = []
+        for key, size in c.fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        c.executemany('DELETE FROM summary_nodes WHERE key = ?', evicted)
+        logger.info(f"Evicted {len(evicted)} nodes from the summary cache.")
+
+    def _summarize(self, prompt):
+        summary = llm_gateway.generate(prompt, service="summary_tree")
+        if summary is None:
+            raise RuntimeError("The model returned no summary for a part of the document.")
+        return summary.strip()
+
+    def _run_tier(self, tier, nodes, prompt):
+        """
+        Summarize one tier of the tree.
+
+        Args:
+            tier (int): 0 for the chunks, 1 and up for the reduce tiers
+            nodes (list): (key, text) pairs, in document order
+            prompt (str): Template the text of a node is filled into
+
+        Returns:
+            list: (key, summary) pairs, in the same order
+        """
+        cached = self._load([key for key, _ in nodes])
+        missing = [(key, text) for key, text in nodes if key not in cached]
+        logger.info(f"Summary tier {tier}: {len(nodes) - len(missing)} of {len(nodes)} nodes cached.")
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(missing))) as pool:
+                summaries = list(pool.map(lambda node: self._summarize(prompt.format(text=node[1])), missing))
+            fresh = {key: summary for (key, _), summary in zip(missing, summaries)}
+            self._store(tier, fresh)
+            cached.update(fresh)
+        return [(key, cached[key]) for key, _ in nodes]
+
+    def summarize(self, text):
+        """
+        Summarize a long text through a tree of partial summaries.
+
+        Args:
+            text (str): The full document text
+
+        Returns:
+            str: Summary of the whole text
+        """
+        return self.summarize_pages([(0, text)])
+
+    def summarize_pages(self, pages):
+        """
+        Like summarize, for a document streamed as (page_no, text) pairs.
+
+        Chunks are mapped in batches as the pages arrive, so only a batch of
+        chunk texts and the partial summaries are held in memory.
+        """
+        level = []
+        batch = []
+        for chunk in chunk_pages(pages, self.chunk_chars, 0):
+            batch.append((_hash("leaf", llm_gateway.model, chunk.text), chunk.text))
+            if len(batch) >= 2 * self.workers:
+                level.extend(self._run_tier(0, batch, MAP_PROMPT))
+                batch = []
+        if batch:
+            level.extend(self._run_tier(0, batch, MAP_PROMPT))
+        if not level:
+            raise ValueError("The document has no text to summarize.")
+        tier = 0
+        while len(level) > 1:
+            tier += 1
+            groups = [level[i:i + self.fanout] for i in range(0, len(level), self.fanout)]
+            nodes = [
+                (_hash("node", *(key for key, _ in group)), "\n\n".join(summary for _, summary in group))
+                for group in groups if len(group) > 1
+            ]
+            reduced = iter(self._run_tier(tier, nodes, REDUCE_PROMPT))
+            # A trailing group of one is carried up unchanged rather than re-summarized.
+            level = [group[0] if len(group) == 1 else next(reduced) for group in groups]
+        return level[0][1]
+
+# Create singleton instance
+summary_tree = SummaryTree()
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from services.vector_index import VectorIndex
+from utils.logging_config import logger
+from config.settings import INDEX_MEMORY_BUDGET_BYTES
+
+_Entry = namedtuple("_Entry", ["version", "store", "size"])
+
+_INDEX_FILES = ("meta.json", "vectors.f32", "hashes.npy")
+# Only present on quantized indexes.
+_OPTIONAL_INDEX_FILES = ("codes.i8",)
+# How often an index directory's mtime is refreshed while it is in use, in seconds.
+_TOUCH_INTERVAL = 10 * 60
+
+class IndexManager:
+    """
+    Process-wide cache of loaded vector indexes.
+
+    Each index directory is loaded once and shared read-only by every session.
+    It is reloaded when its files change on disk, and the least recently used
+    indexes are evicted once their total size exceeds the memory budget.
+    """
+
+    def __init__(self, memory_budget=INDEX_MEMORY_BUDGET_BYTES):
+        """Initialize the IndexManager class."""
+        self.memory_budget = memory_budget
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._touched = {}
+
+    def _version(self, path):
+        """Return a fingerprint of the index files, or None if the index doesn't exist."""
+        try:
+            stats = [os.stat(os.path.join(path, name)) for name in _INDEX_FILES]
+        except OSError:
+            return None
+        for name in _OPTIONAL_INDEX_FILES:
+            try:
+                stats.append(os.stat(os.path.join(path, name)))
+            except OSError:
+                pass
+        return tuple((s.st_mtime_ns, s.st_size) for s in stats)
+
+    def _resident_size(self, version):
+        """Bytes a loaded index keeps paged in for searching."""
+        sizes = [size for _, size in version]
+        if len(sizes) > len(_INDEX_FILES):
+            # Quantized indexes scan their codes; the float32 vectors are only
+            # read for the few rows that get rescored.
+            sizes[_INDEX_FILES.index("vectors.f32")] = 0
+        return sum(sizes)
+
+    def _touch(self, path):
+        """
+        Mark an index as in use by refreshing its directory mtime.
+
+        cleanup_old_data removes indexes by that mtime, so this keeps the
+        documents of active sessions from being deleted under them.
+        """
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(path, 0) < _TOUCH_INTERVAL:
+                return
+            self._touched[path] = now
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _load_lock(self, path):
+        with self._lock:
+            return self._load_locks.setdefault(path, threading.Lock())
+
+    def get(self, path):
+        """
+        Return the loaded index stored at path.
+
+        Args:
+            path (str): Directory the index was saved to
+
+        Returns:
+            VectorIndex: The shared index
+        """
+        version = self._version(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            # A missing version means a writer is swapping the directory in;
+            # keep serving the copy we already have.
+            if entry and (version is None or entry.version == version):
+                self._entries.move_to_end(path)
+                store = entry.store
+            else:
+                store = None
+        if store is not None:
+            self._touch(path)
+            return store
+        if version is None:
+            raise FileNotFoundError(f"No vector index found at {path}")
+
+        with self._load_lock(path):
+            # Another session may have loaded it while we waited.
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry and entry.version == version:
+                    self._entries.move_to_end(path)
+                    return entry.store
+
+            store = VectorIndex.open(path)
+            size = self._resident_size(version)
+            self._touch(path)
+
+            with self._lock:
+                if path in self._entries:
+                    logger.info(f"Reloaded changed vector index {path}.")
+                else:
+                    logger.info(f"Loaded vector index {path}.")
+                self._entries[path] = _Entry(version, store, size)
+                self._entries.move_to_end(path)
+                self._evict()
+            return store
+
+    def _evict(self):
+        """Drop least recently used indexes until the budget is met (caller holds the lock)."""
+        total = sum(entry.size for entry in self._entries.values())
+        while total > self.memory_budget and len(self._entries) > 1:
+            path, entry = self._entries.popitem(last=False)
+            total -= entry.size
+            logger.info(f"Evicted vector index {path} from memory.")
+
+# Create singleton instance
+index_manager = IndexManager()
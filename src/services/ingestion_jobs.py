@@ -0,0 +1,173 @@
+import io
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from services.document_processor import process_documents
+from services.extraction_engine import read_pdf_bytes
+from utils.logging_config import logger
+from config.settings import INGESTION_WORKERS, INGESTION_JOBS_PATH, INGESTION_PROGRESS_INTERVAL
+
+# Job states; a job moves queued -> running -> done or failed.
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+class _Upload(io.BytesIO):
+    """In-memory copy of an uploaded file, so the job outlives the Streamlit run that submitted it."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+class IngestionJobs:
+    """Index uploaded documents on a background worker pool, tracking progress in SQLite."""
+
+    def __init__(self, db_path=INGESTION_JOBS_PATH, workers=INGESTION_WORKERS):
+        """Initialize the IngestionJobs class."""
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingestion")
+        self.create_jobs_table()
+
+    def create_jobs_table(self):
+        """Create the job table and fail jobs left running by a previous process."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS ingestion_jobs(
+                job_id TEXT PRIMARY KEY,
+                username TEXT,
+                status TEXT,
+                total_pages INTEGER DEFAULT 0,
+                pages_extracted INTEGER DEFAULT 0,
+                chunks_embedded INTEGER DEFAULT 0,
+                documents TEXT,
+                error TEXT,
+                created_at REAL,
+                updated_at REAL
+            )
+            ''')
+            c.execute('''
+            UPDATE ingestion_jobs SET status = ?, error = ?, updated_at = ?
+            WHERE status IN (?, ?)
+            ''', (FAILED, "Interrupted by a restart", time.time(), QUEUED, RUNNING))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating ingestion job table: {str(e)}")
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute(f'UPDATE ingestion_jobs SET {assignments} WHERE job_id = ?', (*fields.values(), job_id))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error updating ingestion job {job_id}: {str(e)}")
+
+    def submit(self, pdf_docs, username=None):
+        """
+        Queue the uploaded PDFs for indexing.
+
+        Args:
+            pdf_docs (list): The uploaded PDF files
+            username (str, optional): The user the documents are indexed for
+
+        Returns:
+            str: The job ID to poll with get()
+        """
+        uploads = [_Upload(getattr(pdf, "name", None), read_pdf_bytes(pdf)) for pdf in pdf_docs]
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        c.execute('''
+        INSERT INTO ingestion_jobs(job_id, username, status, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (job_id, username, QUEUED, now, now))
+        conn.commit()
+        conn.close()
+        self._executor.submit(self._run, job_id, uploads, username)
+        logger.info(f"Queued ingestion job {job_id} for {len(uploads)} documents.")
+        return job_id
+
+    def _run(self, job_id, uploads, username):
+        self._update(job_id, status=RUNNING)
+
+        last_write = 0.0
+        latest = {"total_pages": 0, "pages_extracted": 0, "chunks_embedded": 0}
+        lock = threading.Lock()
+        # Filled from the extraction cache and by the engine as it opens each
+        # document, so the total grows instead of every PDF being parsed up front.
+        page_counts = {}
+
+        def progress(pages_extracted, chunks_embedded):
+            nonlocal last_write
+            with lock:
+                latest.update(
+                    total_pages=sum(page_counts.values()),
+                    pages_extracted=pages_extracted,
+                    chunks_embedded=chunks_embedded,
+                )
+                now = time.monotonic()
+                if now - last_write < INGESTION_PROGRESS_INTERVAL:
+                    return
+                last_write = now
+                fields = dict(latest)
+            self._update(job_id, **fields)
+
+        published = {}
+        try:
+            documents = process_documents(
+                uploads, username, progress=progress, published=published, page_counts=page_counts
+            )
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed after indexing {len(published)} documents: {str(e)}")
+            # Documents indexed before the failure stay published; they are
+            # reported so the user knows, and a retry skips their chunks.
+            self._update(job_id, status=FAILED, error=str(e), documents=json.dumps(published), **latest)
+            return
+        # Each document's index was published atomically as it finished; the
+        # job only reports its documents once all of them are in place.
+        self._update(job_id, status=DONE, documents=json.dumps(documents), **latest)
+        logger.info(f"Ingestion job {job_id} finished with {len(documents)} documents.")
+
+    def get(self, job_id):
+        """
+        Return the state of a job.
+
+        Returns:
+            dict: status, total_pages, pages_extracted, chunks_embedded, documents
+            (doc_id -> name once done, or of those indexed before a failure) and
+            error, or None for an unknown job
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            SELECT status, total_pages, pages_extracted, chunks_embedded, documents, error
+            FROM ingestion_jobs WHERE job_id = ?
+            ''', (job_id,))
+            row = c.fetchone()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading ingestion job {job_id}: {str(e)}")
+            return None
+        if row is None:
+            return None
+        status, total_pages, pages_extracted, chunks_embedded, documents, error = row
+        return {
+            "status": status,
+            "total_pages": total_pages,
+            "pages_extracted": pages_extracted,
+            "chunks_embedded": chunks_embedded,
+            "documents": json.loads(documents) if documents else {},
+            "error": error,
+        }
+
+# Create singleton instance
+ingestion_jobs = IngestionJobs()
@@ -0,0 +1,255 @@
+"""
+Single entry point for every LLM call.
+
+The gateway reuses model clients, caps concurrent requests, rate limits them
+with a token bucket, retries transient failures with jittered exponential
+backoff and enforces a deadline per call. Replies of services listed in
+LLM_CACHE_SERVICES are served from the persistent response cache.
+
+Set LLM_TRANSPORT=fake to answer from a local FakeTransport instead of Gemini.
+"""
+import random
+import threading
+import time
+import google.generativeai as genai
+from services.response_cache import response_cache
+from utils.logging_config import logger
+from utils.rate_limiter import TokenBucket
+from config.settings import (
+    LLM_MODEL, LLM_TRANSPORT, LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE,
+    LLM_MAX_RETRIES, LLM_RETRY_BACKOFF_SECONDS, LLM_TIMEOUT_SECONDS
+)
+
+# HTTP statuses of Google API errors worth retrying: quota, server errors and timeouts.
+_RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+def is_retryable(error):
+    """Whether a failed call may succeed when repeated."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return getattr(error, "code", None) in _RETRYABLE_CODES
+
+def response_text(response):
+    """Join the text parts of the first candidate of a Gemini response, or None if it has none."""
+    if response.candidates:
+        candidate = response.candidates[0]
+        if candidate.content and candidate.content.parts:
+            return ' '.join(part.text for part in candidate.content.parts)
+    return None
+
+class GeminiTransport:
+    """Calls the Gemini API, keeping one client per model name."""
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, model_name):
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                model = self._models[model_name] = genai.GenerativeModel(model_name)
+            return model
+
+    def generate(self, model_name, prompt, generation_config=None, timeout=None):
+        """Return the reply text, or None if the model returned none."""
+        response = self._model(model_name).generate_content(
+            prompt, generation_config=generation_config, request_options={"timeout": timeout}
+        )
+        logger.info(f"Model response: {response}")
+        return response_text(response)
+
+    def stream(self, model_name, prompt, generation_config=None, timeout=None):
+        """Yield the reply text in pieces as they arrive."""
+        response = self._model(model_name).generate_content(
+            prompt, generation_config=generation_config, stream=True, request_options={"timeout": timeout}
+        )
+        for chunk in response:
+            text = response_text(chunk)
+            if text:
+                yield text
+
+class FakeTransport:
+    """
+    Local stand-in for GeminiTransport in tests and offline runs.
+
+    Replies come from responder(prompt) when given, else echo the start of the
+    prompt. Exceptions in errors are raised by the first calls, in order, and
+    latency delays every call.
+    """
+
+    def __init__(self, responder=None, errors=(), latency=0.0):
+        self.responder = responder
+        self.errors = list(errors)
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _reply(self, model_name, prompt):
+        with self._lock:
+            self.calls.append((model_name, prompt))
+            error = self.errors.pop(0) if self.errors else None
+        if self.latency:
+            time.sleep(self.latency)
+        if error is not None:
+            raise error
+        if self.responder is not None:
+            return self.responder(prompt)
+        return f"Fake reply to: {' '.join(prompt.split())[:80]}"
+
+    def generate(self, model_name, prompt, generation_config=None, timeout=None):
+        return self._reply(model_name, prompt)
+
+    def stream(self, model_name, prompt, generation_config=None, timeout=None):
+        reply = self._reply(model_name, prompt)
+        if reply:
+            for i, word in enumerate(reply.split(" ")):
+                yield word if i == 0 else " " + word
+
+TRANSPORTS = {"gemini": GeminiTransport, "fake": FakeTransport}
+
+class LLMGateway:
+    """Shared, rate-limited and retrying access to the LLM."""
+
+    def __init__(self, transport=None, model=LLM_MODEL, max_concurrency=LLM_MAX_CONCURRENCY,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE, max_retries=LLM_MAX_RETRIES,
+                 backoff=LLM_RETRY_BACKOFF_SECONDS, timeout=LLM_TIMEOUT_SECONDS):
+        """Initialize the LLMGateway class."""
+        self.transport = transport or TRANSPORTS[LLM_TRANSPORT]()
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # Allow a burst as large as the concurrency cap, e.g. the post-processing fan-out.
+        self.rate_limiter = TokenBucket(requests_per_minute, capacity=max_concurrency)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def _remaining(self, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("LLM call deadline exceeded")
+        return remaining
+
+    def _acquire(self, deadline):
+        """Take a concurrency slot and a rate-limit token before the deadline."""
+        if not self._slots.acquire(timeout=self._remaining(deadline)):
+            raise TimeoutError("Timed out waiting for a free LLM slot")
+        if not self.rate_limiter.acquire(timeout=self._remaining(deadline)):
+            self._slots.release()
+            raise TimeoutError("Timed out waiting for the LLM rate limit")
+
+    def _backoff(self, attempt, error, deadline):
+        """Sleep before the next attempt, or re-raise if the error or the deadline rules it out."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            with self._lock:
+                self.failures += 1
+            raise error
+        # Full jitter keeps sessions that failed together from retrying together.
+        delay = random.uniform(0, self.backoff * 2 ** attempt)
+        if time.monotonic() + delay >= deadline:
+            with self._lock:
+                self.failures += 1
+            raise error
+        logger.warning(f"LLM call failed ({error}), retrying in {delay:.1f}s.")
+        with self._lock:
+            self.retries += 1
+        time.sleep(delay)
+
+    def generate(self, prompt, service, model=None, generation_config=None, timeout=None):
+        """
+        Run a prompt and return the reply text.
+
+        Args:
+            prompt (str): The full prompt
+            service (str): Name of the calling service, for the response cache and logs
+            model (str, optional): Model to use instead of LLM_MODEL
+            generation_config (dict, optional): Generation parameters
+            timeout (float, optional): Deadline in seconds for the call, retries included
+
+        Returns:
+            str: The reply text, or None if the model returned no text
+        """
+        model = model or self.model
+        cached = response_cache.enabled(service)
+        if cached:
+            reply = response_cache.get(model, prompt, generation_config, service)
+            if reply is not None:
+                logger.info(f"LLM response cache hit for {service}.")
+                return reply
+
+        deadline = time.monotonic() + (timeout or self.timeout)
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            try:
+                with self._lock:
+                    self.calls += 1
+                reply = self.transport.generate(model, prompt, generation_config, timeout=self._remaining(deadline))
+                break
+            except Exception as e:
+                error = e
+            finally:
+                self._slots.release()
+            self._backoff(attempt, error, deadline)
+            attempt += 1
+
+        # Empty replies aren't cached, so the prompt is tried again next time.
+        if cached and reply is not None and reply.strip():
+            response_cache.put(model, prompt, reply, generation_config, service)
+        return reply
+
+    def stream(self, prompt, service, model=None, generation_config=None, timeout=None):
+        """
+        Like generate, but yield the reply in pieces as they are produced.
+
+        A cached reply is yielded in one piece. Failures are retried only
+        until the first piece has been yielded, and a streamed reply is cached
+        only once it has been received completely.
+
+        Yields:
+            str: Successive pieces of the reply text
+        """
+        model = model or self.model
+        cached = response_cache.enabled(service)
+        if cached:
+            reply = response_cache.get(model, prompt, generation_config, service)
+            if reply is not None:
+                logger.info(f"LLM response cache hit for {service}.")
+                yield reply
+                return
+
+        deadline = time.monotonic() + (timeout or self.timeout)
+        pieces = []
+        attempt = 0
+        while True:
+            self._acquire(deadline)
+            try:
+                with self._lock:
+                    self.calls += 1
+                for piece in self.transport.stream(model, prompt, generation_config, timeout=self._remaining(deadline)):
+                    pieces.append(piece)
+                    yield piece
+                break
+            except Exception as e:
+                if pieces:
+                    raise
+                error = e
+            finally:
+                self._slots.release()
+            self._backoff(attempt, error, deadline)
+            attempt += 1
+
+        if cached and "".join(pieces).strip():
+            response_cache.put(model, prompt, "".join(pieces), generation_config, service)
+
+    def stats(self):
+        """Return call, retry and failure counters."""
+        with self._lock:
+            return {"calls": self.calls, "retries": self.retries, "failures": self.failures}
+
+# Create singleton instance
+llm_gateway = LLMGateway()
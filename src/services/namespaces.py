@@ -0,0 +1,41 @@
+import hashlib
+import os
+from config.settings import VECTOR_STORE_ROOT
+
+def _user_key(username):
+    """Filesystem-safe key for a user's namespace."""
+    return hashlib.sha256((username or "anonymous").encode("utf-8")).hexdigest()[:16]
+
+def document_id(digest):
+    """Document ID derived from the SHA-256 of the PDF bytes."""
+    return digest[:16]
+
+def document_set_id(doc_ids):
+    """Stable ID of a set of documents, independent of upload order."""
+    return hashlib.sha256("\0".join(sorted(doc_ids)).encode("utf-8")).hexdigest()[:32]
+
+def namespace_path(username, doc_id=None):
+    """
+    Directory holding a user's indexes, or one document's index.
+
+    Args:
+        username (str): The user owning the documents (None for anonymous sessions)
+        doc_id (str, optional): The document ID
+
+    Returns:
+        str: Path of the namespace directory
+    """
+    path = os.path.join(VECTOR_STORE_ROOT, _user_key(username))
+    if doc_id:
+        path = os.path.join(path, doc_id)
+    return path
+
+def list_document_ids(username):
+    """Return the IDs of every document indexed for a user."""
+    path = namespace_path(username)
+    if not os.path.isdir(path):
+        return []
+    return sorted(
+        name for name in os.listdir(path)
+        if os.path.isdir(os.path.join(path, name)) and not name.startswith(".")
+    )
@@ -0,0 +1,110 @@
+import io
+import threading
+from abc import ABC, abstractmethod
+from PyPDF2 import PdfReader
+
+class PdfBackend(ABC):
+    """Page text extractor; documents are opened from a file path or raw bytes."""
+
+    name = None
+
+    @abstractmethod
+    def open(self, source):
+        """Open a document from a file path or raw bytes."""
+
+    @abstractmethod
+    def page_count(self, document):
+        """Return the number of pages of an opened document."""
+
+    @abstractmethod
+    def page_text(self, document, page_no):
+        """Return the text of a zero-based page, or "" if it has none."""
+
+    def close(self, document):
+        pass
+
+class PyPDF2Backend(PdfBackend):
+    """Pure-Python extraction with PyPDF2; always available but the slowest."""
+
+    name = "pypdf2"
+
+    def open(self, source):
+        return PdfReader(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+
+    def page_count(self, document):
+        return len(document.pages)
+
+    def page_text(self, document, page_no):
+        return document.pages[page_no].extract_text() or ""
+
+class PdfiumBackend(PdfBackend):
+    """Extraction with PDFium through pypdfium2."""
+
+    name = "pdfium"
+    # PDFium is not thread-safe; serialize calls within a process.
+    _lock = threading.Lock()
+
+    def open(self, source):
+        import pypdfium2
+        with self._lock:
+            return pypdfium2.PdfDocument(bytes(source) if isinstance(source, bytearray) else source)
+
+    def page_count(self, document):
+        with self._lock:
+            return len(document)
+
+    def page_text(self, document, page_no):
+        with self._lock:
+            page = document[page_no]
+            textpage = page.get_textpage()
+            try:
+                text = textpage.get_text_range()
+            finally:
+                textpage.close()
+                page.close()
+        return text.replace("\r\n", "\n")
+
+    def close(self, document):
+        with self._lock:
+            document.close()
+
+class PyMuPDFBackend(PdfBackend):
+    """Extraction with MuPDF through PyMuPDF."""
+
+    name = "pymupdf"
+
+    def open(self, source):
+        import fitz
+        if isinstance(source, (bytes, bytearray)):
+            return fitz.open(stream=bytes(source), filetype="pdf")
+        return fitz.open(source)
+
+    def page_count(self, document):
+        return document.page_count
+
+    def page_text(self, document, page_no):
+        return document[page_no].get_text()
+
+    def close(self, document):
+        document.close()
+
+BACKENDS = {
+    backend.name: backend for backend in (PyPDF2Backend(), PdfiumBackend(), PyMuPDFBackend())
+}
+
+def get_backend(name):
+    """Return the PDF backend registered under name."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+def available_backends():
+    """Names of the backends whose libraries are installed."""
+    available = []
+    for name, module in (("pypdf2", "PyPDF2"), ("pdfium", "pypdfium2"), ("pymupdf", "fitz")):
+        try:
+            __import__(module)
+        except ImportError:
+            continue
+        available.append(name)
+    return available
@@ -216,6 +216,31 @@ class ProfileService:
             logger.error(f"Error retrieving user quiz history: {str(e)}")
             return []
     
+    def count_topic_quizzes(self, username, topic):
+        """
+        Count the quizzes a user has taken on a topic.
+        
+        Args:
+            username (str): The username of the user
+            topic (str): The quiz topic
+            
+        Returns:
+            int: Number of saved quizzes on the topic
+        """
+        if not username:
+            return 0
+            
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('SELECT COUNT(*) FROM quiz_history WHERE username = ? AND topic = ?', (username, topic))
+            count = c.fetchone()[0]
+            conn.close()
+            return count
+        except Exception as e:
+            logger.error(f"Error counting topic quizzes: {str(e)}")
+            return 0
+    
     def get_quiz_details(self, quiz_id):
         """
         Get detailed information about a specific quiz.
@@ -0,0 +1,267 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Union
+from services.quiz_service import quiz_service
+from utils.logging_config import logger
+from config.settings import (
+    QUESTION_BANK_PATH, QUIZ_QUESTION_COUNT, QUESTION_BANK_FILL_ROUNDS, QUESTION_BANK_LOW_WATER
+)
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+def question_fingerprint(question: str) -> str:
+    """Hash of a question's wording with case, punctuation and spacing ignored."""
+    normalized = " ".join(_NON_WORD.sub(" ", question.lower()).split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def _is_complete(question: Dict) -> bool:
+    return (
+        bool(question.get("question"))
+        and len(question.get("options", [])) == 4
+        and (question.get("correct_answer") or "").upper() in ("A", "B", "C", "D")
+    )
+
+class QuestionBank:
+    """
+    Pre-generated quiz questions per document, served without a model call.
+
+    Questions are banked per document, so a document shared by several
+    uploads or document sets is only ever asked about once, and a quiz on a
+    set of documents draws from each of them in turn. Questions are shared by
+    everyone who uploaded the same document; which ones a user has already
+    been given is tracked per user by fingerprint.
+    """
+
+    def __init__(self, db_path=QUESTION_BANK_PATH, fill_rounds=QUESTION_BANK_FILL_ROUNDS,
+                 low_water=QUESTION_BANK_LOW_WATER):
+        """Initialize the QuestionBank class."""
+        self.db_path = db_path
+        self.fill_rounds = fill_rounds
+        self.low_water = low_water
+        # One fill at a time per document; quiz starts wait on a fill in progress.
+        self._fill_locks = {}
+        self._lock = threading.Lock()
+        self.create_bank_tables()
+
+    def create_bank_tables(self):
+        """Create the question and seen-question tables if they don't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS document_questions(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_id TEXT,
+                fingerprint TEXT,
+                question TEXT,
+                created_at REAL,
+                UNIQUE (doc_id, fingerprint)
+            )
+            ''')
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS document_questions_seen(
+                username TEXT,
+                doc_id TEXT,
+                fingerprint TEXT,
+                seen_at REAL,
+                PRIMARY KEY (username, doc_id, fingerprint)
+            )
+            ''')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating question bank tables: {str(e)}")
+
+    def _fill_lock(self, doc_id):
+        with self._lock:
+            return self._fill_locks.setdefault(doc_id, threading.Lock())
+
+    def _questions(self, doc_id):
+        """Return the texts of every question banked for a document."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('SELECT question FROM document_questions WHERE doc_id = ? ORDER BY id', (doc_id,))
+            rows = c.fetchall()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading question bank: {str(e)}")
+            return []
+        return [json.loads(row[0])["question"] for row in rows]
+
+    def add(self, doc_id: str, questions: List[Dict]) -> int:
+        """Bank complete questions, skipping any already banked for the document; returns the number added."""
+        rows = [
+            (doc_id, question_fingerprint(q["question"]), json.dumps(q), time.time())
+            for q in questions if _is_complete(q)
+        ]
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            before = conn.total_changes
+            c.executemany('''
+            INSERT OR IGNORE INTO document_questions(doc_id, fingerprint, question, created_at) VALUES (?, ?, ?, ?)
+            ''', rows)
+            added = conn.total_changes - before
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error writing question bank: {str(e)}")
+            return 0
+        return added
+
+    def fill(self, context: Union[str, Callable[[], str]], username: str, doc_id: str,
+             rounds: int = None) -> int:
+        """
+        Generate new questions about a document and bank them.
+
+        Rounds run concurrently on different context samples, each told to
+        avoid the questions already banked.
+
+        Args:
+            context (str or callable): Full document text, or a function returning it,
+                used when the document isn't indexed. Rounds run on worker threads,
+                so a function must not touch Streamlit session state.
+            username (str): Owner of the index the context is sampled from
+            doc_id (str): The document
+            rounds (int, optional): Number of generation calls, defaults to fill_rounds
+
+        Returns:
+            int: Number of new questions banked
+        """
+        with self._fill_lock(doc_id):
+            return self._fill(context, username, doc_id, rounds)
+
+    def _fill(self, context, username, doc_id, rounds=None):
+        """Body of fill; the caller holds the document's fill lock."""
+        banked = self._questions(doc_id)
+        rounds = rounds or self.fill_rounds
+        # Seeds continue from earlier fills so each one samples fresh passages.
+        first_seed = len(banked) // QUIZ_QUESTION_COUNT + 1
+        avoid = banked[-10:]
+        with ThreadPoolExecutor(max_workers=rounds) as pool:
+            batches = list(pool.map(
+                lambda seed: quiz_service.generate_quiz(context, username, [doc_id], avoid=avoid, seed=seed),
+                range(first_seed, first_seed + rounds)
+            ))
+        added = self.add(doc_id, [q for batch in batches for q in batch])
+        logger.info(f"Banked {added} new quiz questions for {doc_id} ({len(banked) + added} in total).")
+        return added
+
+    def ensure(self, context: Union[str, Callable[[], str]], username: str, doc_ids: List[str]) -> int:
+        """
+        Fill the documents of a set that have fewer than low_water questions banked.
+
+        Returns:
+            int: Number of questions banked for the set afterwards
+        """
+        total = 0
+        for doc_id in dict.fromkeys(doc_ids):
+            banked = len(self._questions(doc_id))
+            if banked < self.low_water:
+                banked += self.fill(context, username, doc_id)
+            total += banked
+        return total
+
+    def refill_async(self, context: Union[str, Callable[[], str]], username: str, doc_id: str):
+        """Start a fill on a background thread unless one is already running for the document."""
+        lock = self._fill_lock(doc_id)
+        # Taking the lock here, not in the thread, keeps two callers from both starting a fill.
+        if not lock.acquire(blocking=False):
+            return None
+
+        def run():
+            try:
+                self._fill(context, username, doc_id)
+            except Exception as e:
+                logger.error(f"Error refilling question bank: {str(e)}")
+            finally:
+                lock.release()
+
+        thread = threading.Thread(target=run, name="question-bank", daemon=True)
+        try:
+            thread.start()
+        except Exception:
+            lock.release()
+            raise
+        return thread
+
+    def _unseen(self, c, username, doc_id):
+        c.execute('''
+        SELECT q.fingerprint, q.question FROM document_questions q
+        WHERE q.doc_id = ? AND NOT EXISTS (
+            SELECT 1 FROM document_questions_seen s
+            WHERE s.username = ? AND s.doc_id = q.doc_id AND s.fingerprint = q.fingerprint
+        )
+        ORDER BY q.id
+        ''', (doc_id, username or ""))
+        return c.fetchall()
+
+    def draw(self, context: Union[str, Callable[[], str]], username: str, doc_ids: List[str],
+             count: int = QUIZ_QUESTION_COUNT) -> List[Dict]:
+        """
+        Take questions the user hasn't been given yet and mark them as seen.
+
+        Questions are taken from the documents of the set in turn. Waits for
+        fills already in progress, generates synchronously only if the bank
+        has nothing left for the user, and starts a background refill of each
+        document whose unseen questions run low.
+
+        Returns:
+            List[Dict]: Up to count questions
+        """
+        doc_ids = list(dict.fromkeys(doc_ids))
+        # Let running fills, e.g. the ones started after processing, finish first.
+        for doc_id in doc_ids:
+            with self._fill_lock(doc_id):
+                pass
+        questions, remaining = self._take(username, doc_ids, count)
+        if not questions:
+            with ThreadPoolExecutor(max_workers=len(doc_ids)) as pool:
+                list(pool.map(lambda doc_id: self.fill(context, username, doc_id), doc_ids))
+            questions, remaining = self._take(username, doc_ids, count)
+        for doc_id, left in remaining.items():
+            if left < self.low_water:
+                self.refill_async(context, username, doc_id)
+        return questions
+
+    def _take(self, username, doc_ids, count):
+        """
+        Mark up to count unseen questions as seen, one document at a time in turn.
+
+        Returns:
+            tuple: (questions, doc_id -> number of unseen questions left)
+        """
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            unseen = {doc_id: self._unseen(c, username, doc_id) for doc_id in doc_ids}
+            taken = []
+            depth = 0
+            while len(taken) < count and any(len(rows) > depth for rows in unseen.values()):
+                taken.extend(
+                    (doc_id,) + rows[depth] for doc_id, rows in unseen.items() if len(rows) > depth
+                )
+                depth += 1
+            taken = taken[:count]
+            now = time.time()
+            c.executemany('''
+            INSERT OR IGNORE INTO document_questions_seen(username, doc_id, fingerprint, seen_at) VALUES (?, ?, ?, ?)
+            ''', [(username or "", doc_id, fingerprint, now) for doc_id, fingerprint, _ in taken])
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error drawing from question bank: {str(e)}")
+            return [], {doc_id: 0 for doc_id in doc_ids}
+        remaining = {doc_id: len(rows) for doc_id, rows in unseen.items()}
+        for doc_id, _, _ in taken:
+            remaining[doc_id] -= 1
+        return [json.loads(question) for _, _, question in taken], remaining
+
+# Create singleton instance
+question_bank = QuestionBank()
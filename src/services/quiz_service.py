@@ -1,33 +1,43 @@
-import google.generativeai as genai
-from typing import List, Dict
+from typing import Callable, Dict, List, Union
 import traceback
 from utils.logging_config import logger
 from services.profile_service import profile_service
+from services.llm_gateway import llm_gateway
+from services.context_sampler import context_sampler
 
 class QuizService:
-    def generate_quiz(self, context: str, username: str = None) -> List[Dict]:
+    def generate_quiz(self, context: Union[str, Callable[[], str]], username: str = None,
+                      doc_ids: List[str] = None, topic: str = None, avoid: List[str] = None, seed: int = 0) -> List[Dict]:
         """
         Generate quiz questions from the document content.
         
         Args:
-            context (str): The document content to generate questions from
+            context (str or callable): The document content to generate questions from,
+                or a function returning it; only needed when doc_ids can't be sampled
             username (str, optional): The username to check for previously asked questions
+            doc_ids (List[str], optional): Indexed documents to sample a bounded context from
+                instead of sending the whole text
+            topic (str, optional): Focus the questions on this topic
+            avoid (List[str], optional): Question texts not to repeat; defaults to the
+                questions previously asked to the user
+            seed (int): Varies the sampled context between calls
             
         Returns:
             List[Dict]: List of generated quiz questions
         """
-        if not context or len(context) < 100:
-            logger.error("Input text is too short for generating quiz.")
-            return []
-
         try:
+            context = context_sampler.context_for(context, username, doc_ids, topic=topic, seed=seed)
+            if not context or len(context) < 100:
+                logger.error("Input text is too short for generating quiz.")
+                return []
+
             # Get previously asked questions if username is provided
             previously_asked = []
-            if username:
+            if avoid is not None:
+                previously_asked = [{'question': question} for question in avoid]
+            elif username:
                 previously_asked = profile_service.get_previously_asked_questions(username)
                 
-            model = genai.GenerativeModel('gemini-1.5-flash-002')
-            
             # Add instruction to avoid repeating questions if there are previous questions
             avoid_repetition = ""
             if previously_asked and len(previously_asked) > 0:
@@ -41,9 +51,12 @@ class QuizService:
                     Generate completely new and different questions.
                     """
             
+            focus = f"Focus the questions on this topic: {topic}" if topic else ""
+
             quiz_prompt = f"""
             Based on the following context, generate 5 multiple-choice questions to test understanding.
             Each question should have 4 options with only one correct answer.
+            {focus}
             
             Context: {context}
             
@@ -60,39 +73,36 @@ class QuizService:
             Please provide exactly 5 questions.
             """
 
-            response = model.generate_content(quiz_prompt)
+            quiz_text = llm_gateway.generate(quiz_prompt, service="quiz")
             logger.info("Received response from model")
 
-            if response.candidates:
-                candidate = response.candidates[0]
-                if candidate.content and candidate.content.parts:
-                    quiz_text = candidate.content.parts[0].text
-                    questions = []
-                    current_question = {}
+            if quiz_text is not None:
+                questions = []
+                current_question = {}
 
-                    for line in quiz_text.split('\n'):
-                        line = line.strip()
-                        if not line:
-                            continue
+                for line in quiz_text.split('\n'):
+                    line = line.strip()
+                    if not line:
+                        continue
 
-                        if line.startswith('Question:'):
-                            if current_question:
-                                questions.append(current_question)
-                            current_question = {
-                                'question': line[len('Question:'):].strip(),
-                                'options': [],
-                                'correct_answer': None
-                            }
-                        elif line.startswith(('A)', 'B)', 'C)', 'D)')):
-                            current_question['options'].append(line[2:].strip())
-                        elif line.startswith('Correct Answer:'):
-                            current_question['correct_answer'] = line[len('Correct Answer:'):].strip()
+                    if line.startswith('Question:'):
+                        if current_question:
+                            questions.append(current_question)
+                        current_question = {
+                            'question': line[len('Question:'):].strip(),
+                            'options': [],
+                            'correct_answer': None
+                        }
+                    elif line.startswith(('A)', 'B)', 'C)', 'D)')):
+                        current_question['options'].append(line[2:].strip())
+                    elif line.startswith('Correct Answer:'):
+                        current_question['correct_answer'] = line[len('Correct Answer:'):].strip()
 
-                    if current_question:
-                        questions.append(current_question)
+                if current_question:
+                    questions.append(current_question)
 
-                    logger.info(f"Generated {len(questions)} questions")
-                    return questions
+                logger.info(f"Generated {len(questions)} questions")
+                return questions
 
             logger.error("Failed to generate quiz questions")
             return []
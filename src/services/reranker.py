@@ -0,0 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import numpy as np
+from utils.logging_config import logger
+from config.settings import RERANK_MODEL, RERANK_BUDGET_SECONDS, RERANK_BATCH_SIZE
+
+class Reranker:
+    """Cross-encoder reranking on CPU with a latency budget."""
+
+    def __init__(self, model_name=RERANK_MODEL, budget=RERANK_BUDGET_SECONDS, batch_size=RERANK_BATCH_SIZE):
+        """Initialize the Reranker class; the model is loaded on first use or by warm()."""
+        self.model_name = model_name
+        self.budget = budget
+        self.batch_size = batch_size
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rerank")
+        self.timeouts = 0
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, device="cpu")
+                logger.info(f"Loaded reranking model {self.model_name}")
+            return self._model
+
+    def warm(self):
+        """Load the model in the background so the first question doesn't pay for it."""
+        self._executor.submit(self._get_model)
+
+    def _score(self, question, texts):
+        # One batched forward pass over all (question, passage) pairs.
+        return np.asarray(self._get_model().predict(
+            [(question, text) for text in texts],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        ))
+
+    def rerank(self, question, docs, top_k):
+        """
+        Reorder retrieved documents by cross-encoder relevance.
+
+        Falls back to the incoming order if scoring fails or takes longer
+        than the latency budget.
+
+        Args:
+            question (str): The user's question
+            docs (list): Candidate documents, best first
+            top_k (int): Number of documents to keep
+
+        Returns:
+            list: The top_k documents
+        """
+        if len(docs) <= 1:
+            return docs[:top_k]
+        future = self._executor.submit(self._score, question, [doc.page_content for doc in docs])
+        try:
+            scores = future.result(timeout=self.budget)
+        except TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Reranking exceeded {self.budget}s, using retrieval order.")
+            return docs[:top_k]
+        except Exception as e:
+            logger.error(f"Error during reranking: {str(e)}")
+            return docs[:top_k]
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [docs[i] for i in order]
+
+# Create singleton instance
+reranker = Reranker()
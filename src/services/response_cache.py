@@ -0,0 +1,155 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from utils.logging_config import logger
+from config.settings import LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_BYTES, LLM_CACHE_SERVICES
+
+def response_key(model, prompt, params=None):
+    """Cache key of a generation request: model name, prompt hash and generation parameters."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    encoded = json.dumps([model, prompt_hash, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Persistent cache of LLM replies with a TTL and size-bounded LRU eviction."""
+
+    def __init__(self, db_path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES,
+                 services=LLM_CACHE_SERVICES):
+        """Initialize the ResponseCache class."""
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.services = set(services)
+        # service -> [hits, misses]
+        self.counters = {}
+        self._lock = threading.Lock()
+        self.create_cache_table()
+
+    def create_cache_table(self):
+        """Create the table holding cached replies if it doesn't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS llm_responses(
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                service TEXT,
+                response TEXT,
+                size INTEGER,
+                created_at REAL,
+                last_access REAL
+            )
+            ''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_llm_responses_access ON llm_responses(last_access)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating LLM response cache table: {str(e)}")
+
+    def enabled(self, service):
+        """Whether a service has opted in to the cache."""
+        return service in self.services
+
+    def _count(self, service, hit):
+        with self._lock:
+            counters = self.counters.setdefault(service, [0, 0])
+            counters[0 if hit else 1] += 1
+
+    def get(self, model, prompt, params=None, service=None):
+        """
+        Look up a cached reply.
+
+        Args:
+            model (str): Model name
+            prompt (str): The full prompt
+            params (dict, optional): Generation parameters the reply was produced with
+            service (str, optional): Service name the lookup is counted under
+
+        Returns:
+            str: The cached reply, or None on a miss or an expired entry
+        """
+        key = response_key(model, prompt, params)
+        now = time.time()
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('SELECT response, created_at FROM llm_responses WHERE key = ?', (key,))
+            row = c.fetchone()
+            if row and now - row[1] > self.ttl:
+                c.execute('DELETE FROM llm_responses WHERE key = ?', (key,))
+                row = None
+            elif row:
+                c.execute('UPDATE llm_responses SET last_access = ? WHERE key = ?', (now, key))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading LLM response cache: {str(e)}")
+            row = None
+        self._count(service, row is not None)
+        return row[0] if row else None
+
+    def put(self, model, prompt, response, params=None, service=None):
+        """Store a reply and evict expired and least recently used entries."""
+        key = response_key(model, prompt, params)
+        now = time.time()
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            INSERT OR REPLACE INTO llm_responses(key, model, service, response, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (key, model, service, response, len(response.encode("utf-8")), now, now))
+            self._evict(c, now)
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error writing LLM response cache: {str(e)}")
+
+    def _evict(self, c, now):
+        c.execute('DELETE FROM llm_responses WHERE created_at < ?', (now - self.ttl,))
+        c.execute('SELECT COALESCE(SUM(size), 0) FROM llm_responses')
+        total = c.fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        c.execute('SELECT key, size FROM llm_responses ORDER BY last_access ASC')
+        evicted = []
+        for key, size in c.fetchall():
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        c.executemany('DELETE FROM llm_responses WHERE key = ?', evicted)
+        logger.info(f"Evicted {len(evicted)} entries from the LLM response cache.")
+
+    def stats(self):
+        """Return per-service hit/miss counters and the current cache size."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_responses')
+            entries, size = c.fetchone()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading LLM response cache stats: {str(e)}")
+            entries, size = 0, 0
+        with self._lock:
+            services = {
+                service: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses)}
+                for service, (hits, misses) in self.counters.items()
+            }
+            hits = sum(hits for hits, _ in self.counters.values())
+            lookups = sum(hits + misses for hits, misses in self.counters.values())
+        return {
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "services": services,
+            "entries": entries,
+            "bytes": size,
+        }
+
+# Create singleton instance
+response_cache = ResponseCache()
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+from utils.logging_config import logger
+from config.settings import SEMANTIC_CACHE_PATH, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MAX_ENTRIES
+
+def document_set_key(stores):
+    """
+    Identify the document set a question was asked against, and its index version.
+
+    Document IDs are content hashes, so students who uploaded the same files
+    share a document set. The version changes whenever any of the indexes does.
+
+    Args:
+        stores (list): The VectorIndex of every document in the set
+
+    Returns:
+        tuple: (document set ID, index version)
+    """
+    ordered = sorted(stores, key=lambda store: str(store.meta.get("doc_id")))
+    doc_set = hashlib.sha256(
+        "\0".join(str(store.meta.get("doc_id")) for store in ordered).encode("utf-8")
+    ).hexdigest()[:32]
+    version = hashlib.sha256(
+        "\0".join(store.fingerprint() for store in ordered).encode("utf-8")
+    ).hexdigest()[:32]
+    return doc_set, version
+
+class _Entries:
+    """Normalized question embeddings of one document set, stacked for a single matrix product."""
+
+    def __init__(self, version, ids, vectors, answers):
+        self.version = version
+        self.ids = ids
+        self.vectors = vectors
+        self.answers = answers
+
+class SemanticCache:
+    """Reuse chat answers for questions that mean the same thing, per document set."""
+
+    def __init__(self, db_path=SEMANTIC_CACHE_PATH, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 max_entries=SEMANTIC_CACHE_MAX_ENTRIES):
+        """Initialize the SemanticCache class."""
+        self.db_path = db_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._sets = {}
+        self._lock = threading.Lock()
+        self.create_cache_table()
+
+    def create_cache_table(self):
+        """Create the table of cached answers if it doesn't exist."""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('''
+            CREATE TABLE IF NOT EXISTS semantic_answers(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                doc_set TEXT,
+                version TEXT,
+                question TEXT,
+                embedding BLOB,
+                answer TEXT,
+                created_at REAL
+            )
+            ''')
+            c.execute('CREATE INDEX IF NOT EXISTS idx_semantic_answers_set ON semantic_answers(doc_set)')
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error creating semantic cache table: {str(e)}")
+
+    def _entries(self, doc_set, version):
+        """Return the cached entries of a document set, dropping any from an older index version."""
+        entries = self._sets.get(doc_set)
+        if entries is not None and entries.version == version:
+            return entries
+        ids, vectors, answers = [], [], []
+        try:
+            conn = sqlite3.connect(self.db_path)
+            c = conn.cursor()
+            c.execute('DELETE FROM semantic_answers WHERE doc_set = ? AND version != ?', (doc_set, version))
+            if c.rowcount:
+                logger.info(f"Invalidated {c.rowcount} semantic cache entries after an index change.")
+            c.execute('''
+            SELECT id, embedding, answer FROM semantic_answers WHERE doc_set = ? ORDER BY id
+            ''', (doc_set,))
+            for row_id, blob, answer in c.fetchall():
+                ids.append(row_id)
+                vectors.append(np.frombuffer(blob, dtype=np.float32))
+                answers.append(json.loads(answer))
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Error reading semantic cache: {str(e)}")
+        entries = _Entries(version, ids, np.vstack(vectors) if vectors else None, answers)
+        self._sets[doc_set] = entries
+        return entries
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def lookup(self, doc_set, version, embedding):
+        """
+        Find an answer to a question similar enough to this one.
+
+        Args:
+            doc_set (str): Document set ID from document_set_key()
+            version (str): Current index version of the set
+            embedding (list): Embedding of the new question
+
+        Returns:
+            dict: The cached answer, or None
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            entries = self._entries(doc_set, version)
+            best = None
+            if entries.vectors is not None and entries.vectors.shape[1] == len(query):
+                similarities = entries.vectors @ query
+                i = int(np.argmax(similarities))
+                if similarities[i] >= self.threshold:
+                    best = entries.answers[i]
+                    logger.info(f"Semantic cache hit (similarity {similarities[i]:.3f}).")
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return best
+
+    def add(self, doc_set, version, question, embedding, answer):
+        """Store the answer to a question asked against a document set."""
+        vector = self._normalize(embedding)
+        with self._lock:
+            entries = self._entries(doc_set, version)
+            try:
+                conn = sqlite3.connect(self.db_path)
+                c = conn.cursor()
+                c.execute('''
+                INSERT INTO semantic_answers(doc_set, version, question, embedding, answer, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', (doc_set, version, question, vector.tobytes(), json.dumps(answer), time.time()))
+                row_id = c.lastrowid
+                evicted = entries.ids[:max(0, len(entries.ids) + 1 - self.max_entries)]
+                c.executemany('DELETE FROM semantic_answers WHERE id = ?', [(i,) for i in evicted])
+                conn.commit()
+                conn.close()
+            except Exception as e:
+                logger.error(f"Error writing semantic cache: {str(e)}")
+                return
+            # Oldest entries go first once the set is full.
+            keep = len(evicted)
+            stacked = vector[None, :] if entries.vectors is None else np.vstack([entries.vectors[keep:], vector])
+            self._sets[doc_set] = _Entries(
+                version, entries.ids[keep:] + [row_id], stacked, entries.answers[keep:] + [answer]
+            )
+
+    def stats(self):
+        """Return hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "document_sets": len(self._sets),
+            }
+
+# Create singleton instance
+semantic_cache = SemanticCache()
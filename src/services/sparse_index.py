@@ -0,0 +1,223 @@
+import json
+import math
+import os
+import re
+import shutil
+from array import array
+import numpy as np
+from config.settings import BM25_K1, BM25_B
+
+_TOKEN_PATTERN = re.compile(r"\w+(?:[-.]\w+)*")
+
+# Function words only; question words stay, so callers can tell questions from keyword lookups.
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from in is it its of on or that the "
+    "this to was will with".split()
+)
+
+def tokenize(text):
+    """Lowercased word tokens; keeps codes and formula names such as CS-101 or H2O intact."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in _STOPWORDS]
+
+# Appends add a segment; past this many the next write merges them into one.
+_MAX_SEGMENTS = 8
+
+def _segment_file(prefix, name):
+    return f"{prefix}_{name}"
+
+class _Segment:
+    """Postings of one batch of appended rows, in CSR form."""
+
+    def __init__(self, path, prefix):
+        self.prefix = prefix
+        with open(os.path.join(path, _segment_file(prefix, "terms.json"))) as f:
+            self.terms = {term: i for i, term in enumerate(json.load(f))}
+        self.ptr = np.load(os.path.join(path, _segment_file(prefix, "ptr.npy")), mmap_mode="r")
+        self.rows = np.load(os.path.join(path, _segment_file(prefix, "rows.npy")), mmap_mode="r")
+        self.tf = np.load(os.path.join(path, _segment_file(prefix, "tf.npy")), mmap_mode="r")
+
+    def postings(self, term):
+        """Return the (rows, term frequencies) of a term, or None if no row of the segment has it."""
+        t = self.terms.get(term)
+        if t is None:
+            return None
+        start, end = int(self.ptr[t]), int(self.ptr[t + 1])
+        return self.rows[start:end], self.tf[start:end]
+
+class SparseIndex:
+    """
+    BM25 inverted index stored next to a vector index.
+
+    Postings are kept in segments, one per batch of appended rows, each in
+    CSR form: <prefix>_ptr[t]:<prefix>_ptr[t + 1] slices the chunk rows and
+    term frequencies of term t out of <prefix>_rows and <prefix>_tf.
+    bm25_segments.json lists the segment prefixes.
+    """
+
+    def __init__(self, path, segments, lengths):
+        self.path = path
+        self.segments = segments
+        self.lengths = lengths
+        self.average_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    @classmethod
+    def open(cls, path):
+        """Load the sparse index stored in path, or return None if it has none."""
+        manifest = os.path.join(path, "bm25_segments.json")
+        if not os.path.exists(manifest):
+            return None
+        with open(manifest) as f:
+            prefixes = json.load(f)
+        return cls(
+            path,
+            [_Segment(path, prefix) for prefix in prefixes],
+            np.load(os.path.join(path, "bm25_lengths.npy")),
+        )
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def contains(self, term):
+        return any(term in segment.terms for segment in self.segments)
+
+    def postings(self, term):
+        """Return the (rows, term frequencies) of a term across all segments, rows ascending."""
+        found = [p for p in (segment.postings(term) for segment in self.segments) if p is not None]
+        if not found:
+            return None
+        if len(found) == 1:
+            return np.asarray(found[0][0]), np.asarray(found[0][1])
+        return np.concatenate([rows for rows, _ in found]), np.concatenate([tf for _, tf in found])
+
+    def search(self, tokens, k, mask=None):
+        """
+        Score chunks against query tokens with BM25.
+
+        Args:
+            tokens (list): Query tokens from tokenize()
+            k (int): Number of results
+            mask (array, optional): Boolean row mask; other rows are skipped
+
+        Returns:
+            list: (row, score) pairs, best first
+        """
+        count = len(self)
+        if not count:
+            return []
+        scores = np.zeros(count, dtype=np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / max(self.average_length, 1e-9))
+        for token in set(tokens):
+            found = self.postings(token)
+            if found is None:
+                continue
+            rows, tf = found[0], found[1].astype(np.float32)
+            idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tf * (BM25_K1 + 1) / (tf + norm[rows])
+        if mask is not None:
+            scores[~mask] = 0
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+class SparseIndexBuilder:
+    """
+    Accumulate BM25 postings batch by batch for a new index version.
+
+    Only the appended rows are tokenized and held: their postings become a
+    new segment, and the previous version's segments are linked into the new
+    version unchanged. Once there are more than _MAX_SEGMENTS, the write
+    merges them all into one. Postings are kept in compact arrays rather than
+    Python lists, so a builder fed a large document costs a few bytes per
+    (term, chunk) pair.
+    """
+
+    def __init__(self, current=None):
+        self.current = current
+        self.postings = {}
+        self.lengths = array("i")
+        if current is not None:
+            self.lengths.extend(int(length) for length in current.lengths)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, texts):
+        """Add the texts of the next chunk rows."""
+        for row, text in enumerate(texts, start=len(self.lengths)):
+            tokens = tokenize(text)
+            self.lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                entry = self.postings.get(token)
+                if entry is None:
+                    entry = self.postings[token] = (array("i"), array("H"))
+                rows, tfs = entry
+                rows.append(row)
+                tfs.append(min(tf, 65535))
+
+    def _merge_current(self):
+        """Fold the previous version's postings in front of the appended ones."""
+        merged = {}
+        for segment in self.current.segments:
+            for term in segment.terms:
+                rows, tf = segment.postings(term)
+                entry = merged.setdefault(term, (array("i"), array("H")))
+                entry[0].frombytes(np.asarray(rows, dtype=np.int32).tobytes())
+                entry[1].frombytes(np.asarray(tf, dtype=np.uint16).tobytes())
+        for term, (rows, tfs) in self.postings.items():
+            entry = merged.setdefault(term, (array("i"), array("H")))
+            entry[0].extend(rows)
+            entry[1].extend(tfs)
+        self.postings = merged
+
+    def write(self, staging):
+        """Write the accumulated postings into the version being built in staging."""
+        prefixes = []
+        if self.current is not None:
+            if len(self.current.segments) >= _MAX_SEGMENTS:
+                self._merge_current()
+            else:
+                for segment in self.current.segments:
+                    prefix = f"bm25_{len(prefixes)}"
+                    for name in ("terms.json", "ptr.npy", "rows.npy", "tf.npy"):
+                        _link_or_copy(
+                            os.path.join(self.current.path, _segment_file(segment.prefix, name)),
+                            os.path.join(staging, _segment_file(prefix, name))
+                        )
+                    prefixes.append(prefix)
+        if self.postings or not prefixes:
+            prefix = f"bm25_{len(prefixes)}"
+            self._write_segment(staging, prefix)
+            prefixes.append(prefix)
+        with open(os.path.join(staging, "bm25_segments.json"), "w") as f:
+            json.dump(prefixes, f)
+        np.save(os.path.join(staging, "bm25_lengths.npy"), np.frombuffer(self.lengths, dtype=np.int32))
+
+    def _write_segment(self, staging, prefix):
+        terms = sorted(self.postings)
+        ptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            ptr[i + 1] = ptr[i] + len(self.postings[term][0])
+        with open(os.path.join(staging, _segment_file(prefix, "terms.json")), "w") as f:
+            json.dump(terms, f)
+        np.save(os.path.join(staging, _segment_file(prefix, "ptr.npy")), ptr)
+        rows = np.empty(ptr[-1], dtype=np.int32)
+        tf = np.empty(ptr[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            term_rows, term_tf = self.postings[term]
+            rows[ptr[i]:ptr[i + 1]] = np.frombuffer(term_rows, dtype=np.int32)
+            tf[ptr[i]:ptr[i + 1]] = np.frombuffer(term_tf, dtype=np.uint16)
+        np.save(os.path.join(staging, _segment_file(prefix, "rows.npy")), rows)
+        np.save(os.path.join(staging, _segment_file(prefix, "tf.npy")), tf)
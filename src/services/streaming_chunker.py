@@ -0,0 +1,105 @@
+from bisect import bisect_right
+from collections import namedtuple
+from config.settings import CHUNK_SIZE, CHUNK_OVERLAP
+
+# One emitted chunk: its text, the zero-based pages it starts and ends on and
+# its [char_start, char_end) offsets in the document's extracted text.
+Chunk = namedtuple("Chunk", ["text", "page_start", "page_end", "char_start", "char_end"])
+
+# Preferred break points, strongest first, as in RecursiveCharacterTextSplitter.
+_SEPARATORS = ("\n\n", "\n", " ")
+
+class StreamingChunker:
+    """
+    Split a document into overlapping chunks while its pages are still arriving.
+
+    Only the text not yet emitted and the overlap window are buffered, so memory
+    stays at a few chunk sizes plus one page whatever the document length.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap {chunk_overlap} must be smaller than chunk size {chunk_size}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self._buffer = ""
+        # Document offset of _buffer[0], and total characters fed so far.
+        self._start = 0
+        self._length = 0
+        # Document offsets and numbers of the pages still overlapping the buffer.
+        self._page_offsets = []
+        self._page_numbers = []
+
+    def feed(self, page_no, text):
+        """
+        Add the next page of the document.
+
+        Yields:
+            Chunk: Every chunk completed by this page
+        """
+        if not text:
+            return
+        self._page_offsets.append(self._length)
+        self._page_numbers.append(page_no)
+        self._length += len(text)
+        self._buffer += text
+        yield from self._drain(final=False)
+
+    def flush(self):
+        """
+        Emit what is left once the document's last page has been fed.
+
+        Yields:
+            Chunk: The remaining chunks
+        """
+        yield from self._drain(final=True)
+        self._buffer = ""
+        self._start = self._length
+        self._page_offsets, self._page_numbers = [], []
+
+    def _page(self, offset):
+        return self._page_numbers[bisect_right(self._page_offsets, offset) - 1]
+
+    def _break(self):
+        """Length of the next chunk: the last separator in its second half, else a hard cut."""
+        for separator in _SEPARATORS:
+            end = self._buffer.rfind(separator, self.chunk_size // 2, self.chunk_size + len(separator))
+            if end > 0:
+                return end
+        return self.chunk_size
+
+    def _drain(self, final):
+        while len(self._buffer) > self.chunk_size or (final and self._buffer.strip()):
+            end = self._break() if len(self._buffer) > self.chunk_size else len(self._buffer)
+            piece = self._buffer[:end]
+            text = piece.strip()
+            lead = len(piece) - len(piece.lstrip())
+            if text:
+                start = self._start + lead
+                yield Chunk(text, self._page(start), self._page(start + len(text) - 1), start, start + len(text))
+            if end >= len(self._buffer):
+                self._start += len(self._buffer)
+                self._buffer = ""
+                return
+
+            # Start the next chunk up to chunk_overlap characters back, on a word boundary.
+            resume = self._buffer.find(" ", max(end - self.chunk_overlap, 0), end) + 1 or end
+            if resume <= lead:
+                resume = end
+            self._buffer = self._buffer[resume:]
+            self._start += resume
+            while len(self._page_offsets) > 1 and self._page_offsets[1] <= self._start:
+                self._page_offsets.pop(0)
+                self._page_numbers.pop(0)
+
+def chunk_pages(pages, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """
+    Chunk a stream of (page_no, text) pairs of one document.
+
+    Yields:
+        Chunk: Chunks in document order, as soon as each is complete
+    """
+    chunker = StreamingChunker(chunk_size, chunk_overlap)
+    for page_no, text in pages:
+        yield from chunker.feed(page_no, text)
+    yield from chunker.flush()
@@ -1,6 +1,10 @@
-import google.generativeai as genai
+import asyncio
+import itertools
 import traceback
+from services.hierarchical_summary import summary_tree
+from services.llm_gateway import llm_gateway
 from utils.logging_config import logger
+from config.settings import SUMMARY_SINGLE_PASS_CHARS
 
 def summarize_document(text):
     """Summarize the uploaded document using Gemini API."""
@@ -9,7 +13,11 @@ def summarize_document(text):
         return "Input text is too short for summarization."
     
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash-002')
+        if len(text) > SUMMARY_SINGLE_PASS_CHARS:
+            summary = summary_tree.summarize(text)
+            logger.info(f"Generated hierarchical summary: {summary}")
+            return summary
+
         prompt = f"""
         Please provide a concise summary of the following text. The summary should capture the main points and key ideas:
 
@@ -18,17 +26,45 @@ def summarize_document(text):
         Summary:
         """
         
-        response = model.generate_content(prompt)
-        
-        if response.candidates:
-            candidate = response.candidates[0]
-            if candidate.content and candidate.content.parts:
-                summary = ' '.join(part.text for part in candidate.content.parts)
-                logger.info(f"Generated summary: {summary}")
-                return summary
+        summary = llm_gateway.generate(prompt, service="summary")
+        if summary is not None:
+            logger.info(f"Generated summary: {summary}")
+            return summary
         
         return "Unable to generate summary."
     except Exception as e:
         logger.error(f"Error during summarization: {str(e)}")
         logger.error(f"Traceback: {traceback.format_exc()}")
-        return f"Error during summarization: {str(e)}"
\ No newline at end of file
+        return f"Error during summarization: {str(e)}"
+
+def summarize_pages(pages):
+    """
+    Summarize a document streamed as page texts, e.g. those of iter_pdf_pages.
+
+    Pages are read until the text outgrows a single prompt; shorter documents
+    are then summarized like summarize_document, longer ones go through the
+    summary tree without the whole text being joined in memory.
+    """
+    pages = iter(pages)
+    head = []
+    size = 0
+    for page in pages:
+        head.append(page)
+        size += len(page)
+        if size > SUMMARY_SINGLE_PASS_CHARS:
+            break
+    if size <= SUMMARY_SINGLE_PASS_CHARS:
+        return summarize_document("".join(head))
+
+    try:
+        summary = summary_tree.summarize_pages(enumerate(itertools.chain(head, pages)))
+        logger.info(f"Generated hierarchical summary: {summary}")
+        return summary
+    except Exception as e:
+        logger.error(f"Error during summarization: {str(e)}")
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return f"Error during summarization: {str(e)}"
+
+async def summarize_pages_async(pages):
+    """Async variant of summarize_pages; reading the pages and the Gemini calls run on a worker thread."""
+    return await asyncio.to_thread(summarize_pages, pages)
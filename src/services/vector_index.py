@@ -0,0 +1,484 @@
+"""
+Memory-mapped on-disk vector index.
+
+An index directory holds:
+    meta.json     format version, dimension, row count and embedding model
+    vectors.f32   row-major float32 matrix, opened with numpy.memmap
+    sq_norms.f32  squared L2 norm of every row
+    chunks.txt    UTF-8 chunk texts, back to back
+    offsets.npy   int64 byte offsets of each chunk in chunks.txt (count + 1 entries)
+    hashes.npy    content hash of each chunk, used to skip already indexed text
+    bm25_*        BM25 inverted index over the chunk texts (see sparse_index.py)
+    chunk_*.npy   per-chunk page numbers and character offsets (see chunk_metadata.py)
+
+Large indexes additionally carry an int8 scalar-quantized copy of the vectors:
+    codes.i8      row-major int8 codes, one byte per dimension
+    sq_low.f32    per-dimension minimum the codes were trained on
+    sq_step.f32   per-dimension quantization step
+Queries then scan the codes (a quarter of the float32 bytes) and rescore only
+the best candidates against the exact vectors.
+
+Opening an index maps the files instead of reading them, so it takes the same
+few milliseconds at any size and every process serving the index shares the
+OS page cache. Nothing is unpickled.
+
+Convert a legacy LangChain FAISS directory with:
+    python -m services.vector_index faiss_index vector_store/<user key>/<document ID> [embedding model]
+The embedding model defaults to EMBEDDING_MODEL, which legacy indexes were built with.
+"""
+import ctypes
+import errno
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from langchain_core.documents import Document
+from services.chunk_metadata import ChunkMetadata
+from services.sparse_index import SparseIndex, SparseIndexBuilder
+from utils.logging_config import logger
+from config.settings import (
+    EMBEDDING_MODEL, QUANTIZE_ENABLED, QUANTIZE_MIN_VECTORS, QUANTIZE_RETRAIN_GROWTH, QUANTIZE_REFINE_FACTOR
+)
+
+FORMAT_VERSION = 1
+
+# Rows converted at a time while training or encoding codes.
+_BLOCK_ROWS = 65536
+# Size of the float32 buffer used while scanning codes at query time.
+_SCAN_BLOCK_BYTES = 1 << 20
+
+def chunk_hash(text):
+    """Content hash identifying a chunk in the vector store."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+def _exchange_directories(a, b):
+    """Atomically swap two directories with Linux renameat2; returns False where that isn't supported."""
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return False
+    if renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+        # Old kernel or a filesystem without exchange support.
+        return False
+    raise OSError(error, os.strerror(error), b)
+
+def publish_directory(staging, path):
+    """
+    Swap a fully written staging directory in at path.
+
+    On Linux the directories are exchanged atomically, so path always holds a
+    complete index. Elsewhere path is missing for the moment between two
+    renames; IndexManager keeps serving an index it already loaded through
+    that window, and a first load during it fails as if the index didn't exist.
+    """
+    retired = None
+    if os.path.exists(path):
+        if _exchange_directories(staging, path):
+            # The staging name now holds the previous version.
+            retired = staging
+        else:
+            retired = staging + ".old"
+            os.rename(path, retired)
+            os.rename(staging, path)
+    else:
+        os.rename(staging, path)
+    if retired:
+        # Readers may still map the old files; on POSIX they stay valid until unmapped.
+        shutil.rmtree(retired, ignore_errors=True)
+
+def make_staging_directory(path):
+    """Create an empty hidden directory next to path to build a new version in."""
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    # Hidden staging names keep half-written indexes out of namespace listings.
+    return tempfile.mkdtemp(prefix="." + os.path.basename(path) + ".", dir=parent)
+
+class VectorIndex:
+    """Read-only view of an index directory; build new versions with VectorIndex.append or VectorIndexWriter."""
+
+    def __init__(self, path, meta, vectors, sq_norms, offsets, hashes, texts, quantizer=None, sparse=None,
+                 chunk_metadata=None):
+        self.path = path
+        self.sparse = sparse
+        self.chunk_metadata = chunk_metadata if chunk_metadata is not None else ChunkMetadata.unknown(meta["count"])
+        # (codes, low, step) when the index has an int8 copy of its vectors.
+        self.quantizer = quantizer
+        self.meta = meta
+        self.vectors = vectors
+        self.sq_norms = sq_norms
+        self.offsets = offsets
+        self.hashes = hashes
+        self._texts = texts
+        self._hash_ids = None
+        self._fingerprint = None
+
+    @classmethod
+    def open(cls, path):
+        """Map the index stored at path."""
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index format in {path}: {meta.get('format')}")
+        count, dimension = meta["count"], meta["dimension"]
+        if count:
+            vectors = np.memmap(os.path.join(path, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dimension))
+            sq_norms = np.memmap(os.path.join(path, "sq_norms.f32"), dtype=np.float32, mode="r", shape=(count,))
+            with open(os.path.join(path, "chunks.txt"), "rb") as f:
+                texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+        else:
+            vectors = np.empty((0, dimension), dtype=np.float32)
+            sq_norms = np.empty(0, dtype=np.float32)
+            texts = b""
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        hashes = np.load(os.path.join(path, "hashes.npy"))
+        quantizer = None
+        if meta.get("quantization") and count:
+            quantizer = (
+                np.memmap(os.path.join(path, "codes.i8"), dtype=np.int8, mode="r", shape=(count, dimension)),
+                np.fromfile(os.path.join(path, "sq_low.f32"), dtype=np.float32),
+                np.fromfile(os.path.join(path, "sq_step.f32"), dtype=np.float32),
+            )
+        return cls(
+            path, meta, vectors, sq_norms, offsets, hashes, texts, quantizer,
+            SparseIndex.open(path), ChunkMetadata.load(path, count)
+        )
+
+    def __len__(self):
+        return self.meta["count"]
+
+    @property
+    def dimension(self):
+        return self.meta["dimension"]
+
+    def text(self, i):
+        """Return the text of chunk i."""
+        return self._texts[int(self.offsets[i]):int(self.offsets[i + 1])].decode("utf-8")
+
+    def document(self, i):
+        """Return chunk i as a Document carrying its document ID, pages and offsets."""
+        metadata = {"chunk_id": int(i), "doc_id": self.meta.get("doc_id"), "name": self.meta.get("name")}
+        metadata.update(self.chunk_metadata.row(i))
+        return Document(page_content=self.text(i), metadata=metadata)
+
+    def page_mask(self, pages):
+        """Row mask for a (first, last) zero-based page range, or None for no filter."""
+        if pages is None:
+            return None
+        return self.chunk_metadata.page_mask(*pages)
+
+    def fingerprint(self):
+        """Content fingerprint of the index: its embedding model and chunk hashes, in row order."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256(str(self.meta.get("model")).encode("utf-8"))
+            digest.update(np.ascontiguousarray(self.hashes).tobytes())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def hash_ids(self):
+        """Return the chunk-hash -> row map of the index."""
+        if self._hash_ids is None:
+            self._hash_ids = {h.decode("ascii"): i for i, h in enumerate(self.hashes)}
+        return self._hash_ids
+
+    def approximate_vectors(self, rows):
+        """
+        Return the vectors of the given rows, decoded from the int8 codes when the index has them.
+
+        Callers that can live with the quantization error, such as diversity
+        sampling, read a quarter of the bytes and leave the float32 file unpaged.
+        """
+        if self.quantizer is None:
+            return np.asarray(self.vectors[rows], dtype=np.float32)
+        codes, low, step = self.quantizer
+        return low + step * (codes[rows].astype(np.float32) + 128.0)
+
+    def _exact_distances(self, query, rows=None):
+        if rows is None:
+            return self.sq_norms - 2.0 * (self.vectors @ query) + float(query @ query)
+        return self.sq_norms[rows] - 2.0 * (self.vectors[rows] @ query) + float(query @ query)
+
+    def _quantized_distances(self, query):
+        """Approximate distances computed from the int8 codes, block by block."""
+        codes, low, step = self.quantizer
+        # x ~= low + step * (code + 128), so x.q = low.q + 128 * step.q + code.(step * q)
+        weights = step * query
+        constant = float(low @ query) + 128.0 * float(weights.sum())
+        dots = np.empty(len(self), dtype=np.float32)
+        # Small blocks keep the float32 copy of the codes in cache.
+        rows = max(256, _SCAN_BLOCK_BYTES // (4 * self.dimension))
+        for start in range(0, len(self), rows):
+            block = codes[start:start + rows]
+            dots[start:start + len(block)] = block.astype(np.float32) @ weights
+        return self.sq_norms - 2.0 * (dots + constant) + float(query @ query)
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, refine=QUANTIZE_REFINE_FACTOR, exact=False,
+                                               mask=None):
+        """
+        Nearest-neighbour search.
+
+        Args:
+            embedding (list): The query vector
+            k (int): Number of results
+            refine (int): For quantized indexes, rescore k * refine candidates
+                against the exact vectors (0 keeps the approximate scores)
+            exact (bool): Scan the float32 vectors even if the index is quantized
+            mask (array, optional): Boolean row mask, e.g. from page_mask(); other rows are skipped
+
+        Returns:
+            list: (Document, squared L2 distance) pairs, closest first
+        """
+        count = len(self)
+        if not count:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        k = min(k, count)
+        if mask is not None:
+            k = min(k, int(np.count_nonzero(mask)))
+            if not k:
+                return []
+        if self.quantizer is None or exact:
+            distances = self._exact_distances(query)
+            if mask is not None:
+                distances = np.where(mask, distances, np.inf)
+            top = np.argpartition(distances, k - 1)[:k]
+        else:
+            distances = self._quantized_distances(query)
+            if mask is not None:
+                distances = np.where(mask, distances, np.inf)
+            candidates = min(count if mask is None else int(np.count_nonzero(mask)), k * refine) if refine else k
+            top = np.argpartition(distances, candidates - 1)[:candidates]
+            if refine:
+                top = np.sort(top)
+                distances = np.full(count, np.inf, dtype=np.float32)
+                distances[top] = self._exact_distances(query, top)
+                top = top[np.argpartition(distances[top], k - 1)[:k]]
+        top = top[np.argsort(distances[top])]
+        return [(self.document(i), float(distances[i])) for i in top]
+
+    @classmethod
+    def append(cls, path, vectors, texts, hashes, model=None, quantize=QUANTIZE_ENABLED,
+               quantize_min_vectors=QUANTIZE_MIN_VECTORS, retrain_growth=QUANTIZE_RETRAIN_GROWTH,
+               replace=False, chunk_metadata=None, doc_id=None, name=None):
+        """
+        Write a new version of the index at path with extra rows appended.
+
+        Existing files are copied and extended in a staging directory which is
+        then swapped in, so open readers keep a consistent view.
+
+        Args:
+            path (str): Index directory (created if it doesn't exist)
+            vectors (array): New vectors, shape (n, dimension)
+            texts (list): Chunk texts for the new rows
+            hashes (list): Chunk hashes for the new rows
+            model (str, optional): Name of the embedding model that produced the vectors
+            quantize (bool): Keep an int8 copy of the vectors once the index is large enough
+            quantize_min_vectors (int): Row count from which the int8 copy is built
+            retrain_growth (float): Retrain the quantizer once the index has grown by this
+                factor since the last training; smaller appends reuse the trained ranges
+            replace (bool): Discard the existing rows and write only the given ones
+            chunk_metadata (ChunkMetadata, optional): Pages and offsets of the new rows
+            doc_id (str, optional): ID of the document the index belongs to
+            name (str, optional): File name of that document, used in citations
+        """
+        writer = VectorIndexWriter(path, model, replace=replace)
+        try:
+            writer.add(vectors, texts, hashes, chunk_metadata)
+            writer.commit(doc_id=doc_id, name=name, quantize=quantize,
+                          quantize_min_vectors=quantize_min_vectors, retrain_growth=retrain_growth)
+        except Exception:
+            writer.abort()
+            raise
+
+class VectorIndexWriter:
+    """
+    Build a new version of an index directory batch by batch.
+
+    Rows are appended straight to the files of a staging directory, so the
+    caller only ever holds the batch being added; commit() swaps the finished
+    version in and abort() throws it away.
+    """
+
+    def __init__(self, path, model=None, replace=False):
+        """
+        Args:
+            path (str): Index directory (created on commit if it doesn't exist)
+            model (str, optional): Name of the embedding model that produces the vectors
+            replace (bool): Discard the existing rows instead of appending to them
+        """
+        self.path = path
+        self.model = model
+        self.previous = VectorIndex.open(path) if os.path.exists(os.path.join(path, "meta.json")) else None
+        self.current = None if replace else self.previous
+        self.dimension = self.current.dimension if self.current else None
+        self.count = len(self.current) if self.current else 0
+        self.staging = make_staging_directory(path)
+        try:
+            self._files = {}
+            for filename in ("vectors.f32", "sq_norms.f32", "chunks.txt"):
+                target = os.path.join(self.staging, filename)
+                if self.current:
+                    shutil.copyfile(os.path.join(path, filename), target)
+                self._files[filename] = open(target, "ab")
+            self._offsets = [np.asarray(self.current.offsets) if self.current else np.zeros(1, dtype=np.int64)]
+            self._hashes = [self.current.hashes if self.current else np.empty(0, dtype="S64")]
+            self._metadata = [self.current.chunk_metadata] if self.current else []
+            self._sparse = SparseIndexBuilder(self.current.sparse if self.current else None)
+        except Exception:
+            self.abort()
+            raise
+
+    def __len__(self):
+        return self.count
+
+    def add(self, vectors, texts, hashes, chunk_metadata=None):
+        """
+        Append a batch of rows.
+
+        Args:
+            vectors (array): Vectors of the batch, shape (n, dimension)
+            texts (list): Chunk texts of the batch
+            hashes (list): Chunk hashes of the batch
+            chunk_metadata (ChunkMetadata, optional): Pages and offsets of the batch
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dimension is None and vectors.ndim == 2:
+            self.dimension = vectors.shape[1]
+        if not len(texts):
+            return
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dimension}")
+        encoded = [text.encode("utf-8") for text in texts]
+        self._files["vectors.f32"].write(vectors.tobytes())
+        self._files["sq_norms.f32"].write(np.einsum("ij,ij->i", vectors, vectors).astype(np.float32).tobytes())
+        self._files["chunks.txt"].write(b"".join(encoded))
+        self._sparse.add(texts)
+        self._metadata.append(chunk_metadata if chunk_metadata is not None else ChunkMetadata.unknown(len(texts)))
+        self._offsets.append(self._offsets[-1][-1] + np.cumsum([len(text) for text in encoded], dtype=np.int64))
+        self._hashes.append(np.array(hashes, dtype="S64"))
+        self.count += len(texts)
+
+    def commit(self, doc_id=None, name=None, quantize=QUANTIZE_ENABLED, quantize_min_vectors=QUANTIZE_MIN_VECTORS,
+               retrain_growth=QUANTIZE_RETRAIN_GROWTH):
+        """
+        Finish the new version and swap it in at path.
+
+        Args:
+            doc_id (str, optional): ID of the document the index belongs to
+            name (str, optional): File name of that document, used in citations
+            quantize (bool): Keep an int8 copy of the vectors once the index is large enough
+            quantize_min_vectors (int): Row count from which the int8 copy is built
+            retrain_growth (float): Retrain the quantizer once the index has grown by this
+                factor since the last training; smaller appends reuse the trained ranges
+        """
+        if self.dimension is None:
+            raise ValueError("Cannot write an empty vector index without a dimension")
+        for f in self._files.values():
+            f.close()
+        self._sparse.write(self.staging)
+        ChunkMetadata.concat(self._metadata).save(self.staging)
+        np.save(os.path.join(self.staging, "offsets.npy"), np.concatenate(self._offsets))
+        np.save(os.path.join(self.staging, "hashes.npy"), np.concatenate(self._hashes))
+
+        previous = self.previous
+        meta = {
+            "format": FORMAT_VERSION,
+            "dimension": int(self.dimension),
+            "count": self.count,
+            "model": self.model or (self.current.meta.get("model") if self.current else None),
+            "doc_id": doc_id or (previous.meta.get("doc_id") if previous else None),
+            "name": name or (previous.meta.get("name") if previous else None),
+        }
+        if quantize and self.count >= quantize_min_vectors:
+            meta["quantization"] = _write_quantized(
+                self.staging, self.path, self.current, self.count, self.dimension, retrain_growth
+            )
+        with open(os.path.join(self.staging, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        publish_directory(self.staging, self.path)
+
+    def abort(self):
+        """Discard the version being built."""
+        for f in getattr(self, "_files", {}).values():
+            f.close()
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+def _encode(vectors, low, step):
+    codes = np.rint((vectors - low) / step)
+    return (np.clip(codes, 0, 255) - 128).astype(np.int8)
+
+def _write_quantized(staging, path, current, count, dimension, retrain_growth):
+    """Write the int8 codes for a new index version and return their metadata."""
+    all_vectors = np.memmap(os.path.join(staging, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dimension))
+    trained = current.meta.get("quantization") if current else None
+    if trained and count <= trained["trained_on"] * retrain_growth:
+        # Small growth: encode only the new rows with the existing ranges.
+        for name in ("codes.i8", "sq_low.f32", "sq_step.f32"):
+            shutil.copyfile(os.path.join(path, name), os.path.join(staging, name))
+        low = np.fromfile(os.path.join(staging, "sq_low.f32"), dtype=np.float32)
+        step = np.fromfile(os.path.join(staging, "sq_step.f32"), dtype=np.float32)
+        with open(os.path.join(staging, "codes.i8"), "ab") as f:
+            for start in range(len(current), count, _BLOCK_ROWS):
+                f.write(_encode(all_vectors[start:start + _BLOCK_ROWS], low, step).tobytes())
+        del all_vectors
+        return trained
+
+    low = np.full(dimension, np.inf, dtype=np.float32)
+    high = np.full(dimension, -np.inf, dtype=np.float32)
+    for start in range(0, count, _BLOCK_ROWS):
+        block = all_vectors[start:start + _BLOCK_ROWS]
+        low = np.minimum(low, block.min(axis=0))
+        high = np.maximum(high, block.max(axis=0))
+    step = np.maximum((high - low) / 255.0, np.float32(1e-12)).astype(np.float32)
+    low.tofile(os.path.join(staging, "sq_low.f32"))
+    step.tofile(os.path.join(staging, "sq_step.f32"))
+    with open(os.path.join(staging, "codes.i8"), "wb") as f:
+        for start in range(0, count, _BLOCK_ROWS):
+            f.write(_encode(all_vectors[start:start + _BLOCK_ROWS], low, step).tobytes())
+    del all_vectors
+    logger.info(f"Trained int8 quantizer on {count} vectors for {path}")
+    return {"type": "int8", "trained_on": count}
+
+def convert_faiss_index(source, destination, model=EMBEDDING_MODEL):
+    """
+    Convert a LangChain FAISS directory into the memory-mapped format.
+
+    The source is unpickled, so only convert indexes you created yourself.
+    model must name the embedding model the source was built with; the
+    converted index is only searched while that model is configured.
+
+    Returns:
+        int: Number of vectors converted
+    """
+    from langchain_community.vectorstores import FAISS
+
+    store = FAISS.load_local(source, embeddings=None, allow_dangerous_deserialization=True)
+    count = store.index.ntotal
+    vectors = store.index.reconstruct_n(0, count) if count else np.empty((0, store.index.d), dtype=np.float32)
+    texts = [store.docstore.search(store.index_to_docstore_id[i]).page_content for i in range(count)]
+
+    # Keep the first copy of any chunk that was indexed twice.
+    keep = {}
+    for i, text in enumerate(texts):
+        keep.setdefault(chunk_hash(text), i)
+    rows = sorted(keep.values())
+    VectorIndex.append(destination, vectors[rows], [texts[i] for i in rows], [chunk_hash(texts[i]) for i in rows], model)
+    logger.info(f"Converted {len(rows)} vectors from {source} to {destination}")
+    return len(rows)
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(__doc__)
+        sys.exit(1)
+    print(f"Converted {convert_faiss_index(*sys.argv[1:])} vectors.")
@@ -1,20 +1,84 @@
+import functools
 import streamlit as st
-import os
-from services.document_processor import get_pdf_text, get_text_chunks, update_vector_store
+from services.document_processor import get_pdf_text
+from services.extraction_engine import read_pdf_bytes
+from services.ingestion_jobs import ingestion_jobs
+from services.artifact_store import artifact_store
+from services.question_bank import question_bank
+from services.flashcard_deck import flashcard_deck
 from services.ai_service import ai_service
+from services.conversation_memory import ConversationMemory
 from services.quiz_service import quiz_service
-from services.flashcard_service import flashcard_service
 from services.translation_service import translation_service
 from services.sharing_service import sharing_service
 from services.text_complexity_service import analyze_text_complexity, visualize_text_complexity
-from services.key_concepts_service import extract_key_concepts
-from services.text_summary_service import summarize_document
-from services.text_translation_service import TranslationService
 from services.speech_service import speech_service
 from utils.logging_config import logger
 from ui.profile_components import profile_button
 from services.profile_service import profile_service
 
+@st.fragment(run_every=1)
+def ingestion_progress():
+    """Poll the running ingestion job and publish its documents to the session once it is done."""
+    job = ingestion_jobs.get(st.session_state.ingestion_job)
+    if job is None:
+        st.session_state.ingestion_job = None
+        return
+    if job["status"] in ("queued", "running"):
+        total = job["total_pages"]
+        st.progress(
+            min(job["pages_extracted"] / total, 1.0) if total else 0.0,
+            text=f"Processing documents: {job['pages_extracted']}/{total or '?'} pages extracted, "
+                 f"{job['chunks_embedded']} chunks embedded"
+        )
+        return
+
+    st.session_state.ingestion_job = None
+    if job["status"] == "failed":
+        st.error(f"Processing failed: {job['error']}")
+        if job["documents"]:
+            indexed = ", ".join(name or doc_id for doc_id, name in job["documents"].items())
+            st.warning(f"Indexed before the failure: {indexed}. Processing again only embeds what is missing.")
+        return
+    st.session_state.doc_ids = list(job["documents"])
+    # The full text is assembled only if a feature needs it, see document_text().
+    st.session_state.context = None
+    logger.info("Documents processed and stored in session state.")
+    # Summary, flashcards and quiz are generated together in the background.
+    artifact_store.start(st.session_state.pdf_docs, st.session_state.get("username"), st.session_state.doc_ids)
+    st.toast("Documents processed successfully!")
+    st.rerun()
+
+def documents_ready():
+    """Whether documents have been processed in this session."""
+    return bool(st.session_state.get("doc_ids"))
+
+def document_text():
+    """
+    Full text of the processed documents.
+
+    Chat, quizzes, flashcards and summaries work from the indexes and the
+    extraction cache; the whole text is only read back, once per session,
+    when a feature such as translation needs all of it.
+    """
+    if not st.session_state.get("context"):
+        st.session_state.context = get_pdf_text(st.session_state.pdf_docs)
+    return st.session_state.context
+
+def document_text_source():
+    """
+    The full text if it was already read back, else a function assembling it.
+
+    Quiz and flashcard generation only need the text when the documents
+    can't be sampled, and may call the function from worker threads, which
+    have no access to session state; the upload bytes are captured here, on
+    the script thread, instead.
+    """
+    if st.session_state.get("context"):
+        return st.session_state.context
+    pdf_docs = [read_pdf_bytes(pdf) for pdf in st.session_state.pdf_docs]
+    return functools.lru_cache(maxsize=1)(lambda: get_pdf_text(pdf_docs))
+
 def sidebar_components():
     with st.sidebar:
         # Add app logo and title at the top
@@ -61,16 +125,13 @@ def sidebar_components():
         
         if process_btn:
             if pdf_docs:
-                with st.spinner("Processing documents..."):
-                    st.session_state.pdf_docs = pdf_docs  # Store PDFs in session state
-                    raw_text = get_pdf_text(pdf_docs)
-                    text_chunks = get_text_chunks(raw_text)
-                    update_vector_store(text_chunks)
-                    st.session_state.context = raw_text
-                    logger.info("Context extracted and stored in session state.")
-                st.success("Documents processed successfully!")
+                st.session_state.pdf_docs = pdf_docs  # Store PDFs in session state
+                st.session_state.ingestion_job = ingestion_jobs.submit(pdf_docs, st.session_state.get("username"))
             else:
                 st.warning("Please upload PDF documents first.")
+
+        if st.session_state.get("ingestion_job"):
+            ingestion_progress()
         
         # Add app info at the bottom
         st.markdown("<hr style='margin-top: 20px; margin-bottom: 20px;'>", unsafe_allow_html=True)
@@ -86,6 +147,19 @@ def sidebar_components():
         
     return "Chat", pdf_docs  # Default to chat interface
 
+def conversation_memory(history):
+    """
+    Return the session's conversation memory for the given earlier messages.
+
+    The memory is rebuilt when it no longer matches them, e.g. after the chat
+    was cleared or a saved chat was loaded.
+    """
+    answers = sum(1 for message in history if message.get("role") == "assistant")
+    memory = st.session_state.get("chat_memory")
+    if memory is None or len(memory) != answers:
+        memory = st.session_state.chat_memory = ConversationMemory.from_messages(history)
+    return memory
+
 def chat_interface():
     st.header("Chat with your Documents")
     if "messages" not in st.session_state:
@@ -97,13 +171,36 @@ def chat_interface():
 
     if prompt := st.text_input("Ask a question about your documents:"):
         st.session_state.messages.append({"role": "user", "content": prompt})
-        if os.path.exists("faiss_index"):
-            with st.spinner("Generating response..."):
-                response = ai_service.user_input(prompt)
-                st.session_state.messages.append({"role": "assistant", "content": response['output_text']})
+        if st.session_state.get("doc_ids"):
+            with st.chat_message("assistant"):
+                with st.spinner("Generating response..."):
+                    stream = ai_service.user_input_stream(
+                        prompt,
+                        st.session_state.get("username"),
+                        st.session_state.doc_ids,
+                        memory=conversation_memory(st.session_state.messages[:-1])
+                    )
+                st.write_stream(stream)
+                answer = stream.output_text
+                if stream.sources:
+                    st.markdown(f"*Sources: {stream.sources}*")
+                    answer += f"\n\n*Sources: {stream.sources}*"
+            st.session_state.messages.append({"role": "assistant", "content": answer})
         else:
             st.warning("Please upload and process documents before asking questions.")
 
+def topic_quiz_seed(username, topic):
+    """
+    Sampling seed for an on-demand topic quiz.
+
+    It counts the quizzes the user has taken on the topic, plus those started
+    in this session, so each new quiz on a topic is built from other passages.
+    """
+    taken = profile_service.count_topic_quizzes(username, topic)
+    started = st.session_state.setdefault("topic_quizzes_started", {})
+    started[topic] = started.get(topic, 0) + 1
+    return taken + started[topic]
+
 def quiz_interface():
     st.header("Quiz Mode")
     
@@ -134,12 +231,21 @@ def quiz_interface():
         topic = st.text_input("Quiz Topic (optional):", key="quiz_topic_input")
         
         if st.button("Start Quiz"):
-            if "context" in st.session_state:
+            if documents_ready():
                 # Save the topic
                 st.session_state.quiz_topic = topic
                 
-                # Generate questions, passing username to avoid repeating questions
-                questions = quiz_service.generate_quiz(st.session_state.context, username)
+                # Serve unseen questions from the document's question bank
+                questions = None
+                if not topic:
+                    with st.spinner("Preparing quiz..."):
+                        questions = question_bank.draw(document_text_source(), username, st.session_state.doc_ids)
+                if not questions:
+                    # Generate questions, passing username to avoid repeating questions
+                    questions = quiz_service.generate_quiz(
+                        document_text_source(), username, st.session_state.doc_ids, topic=topic or None,
+                        seed=topic_quiz_seed(username, topic)
+                    )
                 if questions:
                     st.session_state.questions = questions
                     st.session_state.quiz_state = "in_progress"
@@ -264,7 +370,7 @@ def quiz_interface():
 
 def flashcard_interface():
     st.header("Flashcards")
-    if "context" in st.session_state:
+    if documents_ready():
         # Initialize flashcard generation counter if it doesn't exist
         if "flashcard_gen_count" not in st.session_state:
             st.session_state.flashcard_gen_count = 0
@@ -272,10 +378,12 @@ def flashcard_interface():
         # Generate flashcards if they don't exist
         if "flashcards" not in st.session_state:
             with st.spinner("Generating flashcards..."):
-                # Pass the counter to ensure different generations
-                flashcards, error = flashcard_service.generate_flashcards(
-                    st.session_state.context, 
-                    iteration=st.session_state.flashcard_gen_count
+                # Each regeneration shows the next page of the stored deck
+                flashcards, error = flashcard_deck.page(
+                    document_text_source(),
+                    st.session_state.get("username"),
+                    st.session_state.doc_ids,
+                    st.session_state.flashcard_gen_count
                 )
                 if not error:
                     st.session_state.flashcards = flashcards
@@ -302,18 +410,18 @@ def flashcard_interface():
 
 def translation_interface():
     st.header("Translation")
-    if "context" in st.session_state:
+    if documents_ready():
         target_lang = st.selectbox("Select target language:", ["es", "fr", "de", "it", "pt"])
         if st.button("Translate"):
-            translated_text = translation_service.translate_text(st.session_state.context, target_lang)
+            translated_text = translation_service.translate_text(document_text(), target_lang)
             st.write(translated_text)
     else:
         st.warning("Please upload and process documents first.")
 
 def analysis_interface():
     st.header("Text Analysis")
-    if "context" in st.session_state:
-        complexity_data = analyze_text_complexity(st.session_state.context)
+    if documents_ready():
+        complexity_data = analyze_text_complexity(document_text())
         complexity_metrics = {
             "Average Words per Sentence": complexity_data['avg_words_per_sentence'],
             "Average Word Length": complexity_data['avg_word_length'],
@@ -360,9 +468,9 @@ def sharing_interface():
 
 def audio_interface():
     st.header("Audio Learning")
-    if "context" in st.session_state:
+    if documents_ready():
         if st.button("Convert to Speech"):
-            audio_file = speech_service.text_to_speech(st.session_state.context)
+            audio_file = speech_service.text_to_speech(document_text())
             if audio_file:
                 st.audio(audio_file, format='audio/mp3')
                 st.download_button(
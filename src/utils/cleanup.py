@@ -2,14 +2,26 @@ import os
 import time
 import shutil
 from utils.logging_config import logger
+from config.settings import FAISS_INDEX_PATH, VECTOR_STORE_ROOT
 
 def cleanup_old_data():
     # Remove old FAISS index files
-    if os.path.exists("faiss_index"):
-        if time.time() - os.path.getmtime("faiss_index") > 24 * 60 * 60:  # 24 hours
-            shutil.rmtree("faiss_index")
+    if os.path.exists(FAISS_INDEX_PATH):
+        if time.time() - os.path.getmtime(FAISS_INDEX_PATH) > 24 * 60 * 60:  # 24 hours
+            shutil.rmtree(FAISS_INDEX_PATH)
             logger.info("Removed old FAISS index")
 
+    # Remove per-document indexes that haven't been updated or searched for a day;
+    # IndexManager refreshes the mtime of the indexes it serves.
+    if os.path.exists(VECTOR_STORE_ROOT):
+        for user_dir in os.scandir(VECTOR_STORE_ROOT):
+            if not user_dir.is_dir():
+                continue
+            for doc_dir in os.scandir(user_dir.path):
+                if doc_dir.is_dir() and time.time() - doc_dir.stat().st_mtime > 24 * 60 * 60:
+                    shutil.rmtree(doc_dir.path)
+                    logger.info(f"Removed old FAISS index {doc_dir.path}")
+
     # Clear Streamlit cache if it's too large
     cache_path = os.path.join(os.path.expanduser("~"), ".streamlit/cache")
     if os.path.exists(cache_path):
@@ -0,0 +1,40 @@
+import threading
+import time
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how often a shared resource is called."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        """
+        Args:
+            rate_per_minute (float): Tokens added per minute; 0 or None disables limiting
+            capacity (float, optional): Maximum burst size, defaults to one second of tokens
+        """
+        self.rate = (rate_per_minute or 0) / 60.0
+        self.capacity = capacity or max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1, timeout=None):
+        """
+        Block until tokens are available.
+
+        Returns:
+            bool: True once the tokens were taken, False if timeout expired first
+        """
+        if not self.rate:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)